@@ -1,7 +1,11 @@
 """__init__.py"""
 # flake8: noqa
 from .analysis import *
+from .campaign import *
 from .models import *
+from .scan import *
+from .sensitivity import *
 from .sources import *
 from .test_statistics import *
 from .time_profiles import *
+from .ts_distribution import *
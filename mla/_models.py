@@ -15,7 +15,10 @@ __status__ = 'Development'
 from typing import Optional, Tuple, Union
 
 import copy
-import scipy
+import importlib
+import json
+import os
+import pickle
 import numpy as np
 import numpy.lib.recfunctions as rf
 from scipy.interpolate import UnivariateSpline as Spline
@@ -28,16 +31,87 @@ from . import sources
 from . import time_profiles
 
 
-def cross_matrix(mat: np.array) -> np.array:
-    """Calculate cross product matrix.
-    A[ij] = x_i * y_j - y_i * x_j
+def unit_vector(
+    r_a: np.ndarray,
+    dec: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Converts sky coordinates to cartesian unit vectors.
+
+    Args:
+        r_a: The right ascension (radians).
+        dec: The declination (radians).
+
+    Returns:
+        The x, y, and z components of the unit vectors.
+    """
+    cos_dec = np.cos(dec)
+    return cos_dec * np.cos(r_a), cos_dec * np.sin(r_a), np.sin(dec)
+
+
+def add_unit_vectors(events: np.ndarray) -> np.ndarray:
+    """Appends the cartesian unit vector of each event as x, y, z fields.
+
+    The spatial terms compute angular distances from these fields instead of
+    from ra and dec when they are present.
+
     Args:
-        mat: A 2D array to take the cross product of.
+        events: An array of events including their ra and dec.
+
     Returns:
-        The cross matrix.
+        The events with x, y, z fields, or events itself if it already has
+        them.
     """
-    skv = np.roll(np.roll(np.diag(mat.ravel()), 1, 1), -1, 0)
-    return skv - skv.T
+    if 'x' in events.dtype.names:
+        return events
+
+    # Filling a new array by field is much faster than rf.append_fields().
+    with_vectors = np.empty(len(events), dtype=[
+        *[(name, events.dtype[name]) for name in events.dtype.names],
+        ('x', np.float64),
+        ('y', np.float64),
+        ('z', np.float64),
+    ])
+    for name in events.dtype.names:
+        with_vectors[name] = events[name]
+    with_vectors['x'], with_vectors['y'], with_vectors['z'] = unit_vector(
+        events['ra'], events['dec'])
+    return with_vectors
+
+
+def _set_ra_unit_vectors(events: np.ndarray) -> None:
+    """Updates the x and y fields of events after their ra was changed."""
+    if 'x' not in events.dtype.names:
+        return
+    cos_dec = np.hypot(events['x'], events['y'])
+    events['x'] = cos_dec * np.cos(events['ra'])
+    events['y'] = cos_dec * np.sin(events['ra'])
+
+
+def rotate_vectors(vec1: np.ndarray, vec2: np.ndarray,
+                   vec3: np.ndarray) -> np.ndarray:
+    """Rotates each vec3 by the rotation taking vec1 onto vec2.
+
+    The rotation is about the axis vec1 x vec2, by the angle between vec1 and
+    vec2 (Rodrigues' rotation formula), for each row at once.
+
+    Args:
+        vec1: An (n, 3) array of unit vectors to rotate from.
+        vec2: An (n, 3) array of unit vectors to rotate onto.
+        vec3: An (n, 3) array of the vectors that will actually be rotated.
+
+    Returns:
+        The (n, 3) array of rotated vec3.
+    """
+    axis = np.cross(vec1, vec2)
+    sin_alpha = np.sqrt(np.sum(axis**2, axis=1))
+    cos_alpha = np.clip(np.sum(vec1 * vec2, axis=1), -1, 1)
+    axis[sin_alpha > 0] /= sin_alpha[sin_alpha > 0, np.newaxis]
+
+    along_axis = np.sum(axis * vec3, axis=1) * (1 - cos_alpha)
+    rotated = vec3 * cos_alpha[:, np.newaxis]
+    rotated += np.cross(axis, vec3) * sin_alpha[:, np.newaxis]
+    rotated += axis * along_axis[:, np.newaxis]
+    return rotated
 
 
 def rotate(ra1: float, dec1: float, ra2: float, dec2: float,
@@ -72,43 +146,23 @@ def rotate(ra1: float, dec1: float, ra2: float, dec2: float,
     ):
         raise IndexError('Arguments must all have the same dimension.')
 
-    cos_alpha = np.cos(ra2 - ra1) * np.cos(dec1) * np.cos(dec2) \
-        + np.sin(dec1) * np.sin(dec2)
-
-    # correct rounding errors
-    cos_alpha[cos_alpha > 1] = 1
-    cos_alpha[cos_alpha < -1] = -1
-
-    alpha = np.arccos(cos_alpha)
-    vec1 = np.vstack([np.cos(ra1) * np.cos(dec1),
-                      np.sin(ra1) * np.cos(dec1),
-                      np.sin(dec1)]).T
-    vec2 = np.vstack([np.cos(ra2) * np.cos(dec2),
-                      np.sin(ra2) * np.cos(dec2),
-                      np.sin(dec2)]).T
-    vec3 = np.vstack([np.cos(ra3) * np.cos(dec3),
-                      np.sin(ra3) * np.cos(dec3),
-                      np.sin(dec3)]).T
-    nvec = np.cross(vec1, vec2)
-    norm = np.sqrt(np.sum(nvec**2, axis=1))
-    nvec[norm > 0] /= norm[np.newaxis, norm > 0].T
-
-    one = np.diagflat(np.ones(3))
-    ntn = np.array([np.outer(nv, nv) for nv in nvec])
-    nx = np.array([cross_matrix(nv) for nv in nvec])
-
-    r = np.array([(1. - np.cos(a)) * ntn_i + np.cos(a) * one + np.sin(a) * nx_i
-                  for a, ntn_i, nx_i in zip(alpha, ntn, nx)])
-    vec = np.array([np.dot(r_i, vec_i.T) for r_i, vec_i in zip(r, vec3)])
+    vec = rotate_vectors(
+        np.stack(unit_vector(ra1, dec1), axis=1),
+        np.stack(unit_vector(ra2, dec2), axis=1),
+        np.stack(unit_vector(ra3, dec3), axis=1),
+    )
 
     r_a = np.arctan2(vec[:, 1], vec[:, 0])
-    dec = np.arcsin(vec[:, 2])
+    dec = np.arcsin(np.clip(vec[:, 2], -1, 1))
 
     r_a += np.where(r_a < 0., 2. * np.pi, 0.)
 
     return r_a, dec
 
 
+SAVE_FORMAT_VERSION = 1
+
+
 @dataclass
 class EventModelBase:
     """Stores the events and pre-processed parameters used in analyses.
@@ -143,6 +197,121 @@ class EventModelBase:
     _livetime: float = field(init=False)
     _sampling_width: Optional[float] = field(init=False)
 
+    def save(self, path: str) -> None:
+        """Saves the model to a directory that load() can read.
+
+        Every numpy array of the model is written to its own .npy file (with
+        a second one for the mask of a masked array), and every number,
+        string, or None to a JSON manifest. Anything else (such as the
+        source, the time profiles, and the background spline) is small, and
+        is pickled together into one file.
+
+        Args:
+            path: The directory to save to. It is created if needed.
+        """
+        os.makedirs(path, exist_ok=True)
+        manifest = {
+            'format_version': SAVE_FORMAT_VERSION,
+            'class': f'{type(self).__module__}.{type(self).__qualname__}',
+            'arrays': [],
+            'masked_arrays': [],
+            'values': {},
+        }
+        objects = {}
+
+        for name, value in vars(self).items():
+            if isinstance(value, np.generic):
+                value = value.item()
+            is_masked = isinstance(value, np.ma.MaskedArray)
+            is_plain_array = isinstance(value, np.ndarray) and not is_masked
+            if is_plain_array and not value.dtype.hasobject:
+                np.save(os.path.join(path, f'{name}.npy'), value,
+                        allow_pickle=False)
+                manifest['arrays'].append(name)
+            elif is_masked and not value.dtype.hasobject:
+                np.save(os.path.join(path, f'{name}.npy'), value.data,
+                        allow_pickle=False)
+                np.save(os.path.join(path, f'{name}.mask.npy'),
+                        np.ma.getmaskarray(value), allow_pickle=False)
+                manifest['masked_arrays'].append(name)
+            elif value is None or isinstance(value, (bool, int, float, str)):
+                manifest['values'][name] = value
+            else:
+                objects[name] = value
+
+        with open(os.path.join(path, 'objects.pkl'), 'wb') as objects_file:
+            pickle.dump(objects, objects_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # The manifest is written last, so a directory that has one is
+        # complete.
+        with open(os.path.join(path, 'manifest.json'), 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        mmap_mode: Optional[str] = 'c',
+    ) -> 'EventModelBase':
+        """Loads a model saved by save().
+
+        The model is made as the class it was saved from, without running
+        its __post_init__(), so nothing is rebuilt. The arrays are
+        memory-mapped by default, so loading takes about as long as opening
+        the files, and processes that load the same model share its pages.
+
+        Args:
+            path: The directory the model was saved to.
+            mmap_mode: Passed on to np.load(). The default, 'c', maps the
+                arrays copy-on-write: changes stay in memory and never reach
+                the files. None reads the arrays into memory.
+
+        Returns:
+            The model.
+
+        Raises:
+            ValueError: If the directory was saved in another format version.
+            TypeError: If the saved model is not an instance of cls.
+        """
+        with open(os.path.join(path, 'manifest.json')) as manifest_file:
+            manifest = json.load(manifest_file)
+
+        if manifest['format_version'] != SAVE_FORMAT_VERSION:
+            raise ValueError(
+                f'Cannot load format version {manifest["format_version"]}.')
+
+        module_name, class_name = manifest['class'].rsplit('.', 1)
+        model_class = getattr(importlib.import_module(module_name), class_name)
+        if not issubclass(model_class, cls):
+            raise TypeError(
+                f'{manifest["class"]} is not a subclass of {cls.__name__}.')
+
+        model = model_class.__new__(model_class)
+        for name in manifest['arrays']:
+            setattr(model, name, np.load(
+                os.path.join(path, f'{name}.npy'),
+                mmap_mode=mmap_mode,
+                allow_pickle=False,
+            ))
+
+        for name in manifest['masked_arrays']:
+            setattr(model, name, np.ma.MaskedArray(
+                np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode,
+                        allow_pickle=False),
+                mask=np.load(os.path.join(path, f'{name}.mask.npy'),
+                             mmap_mode=mmap_mode, allow_pickle=False),
+                copy=False,
+            ))
+
+        for name, value in manifest['values'].items():
+            setattr(model, name, value)
+
+        with open(os.path.join(path, 'objects.pkl'), 'rb') as objects_file:
+            for name, value in pickle.load(objects_file).items():
+                setattr(model, name, value)
+
+        return model
+
 
 @dataclass
 class EventModelDefaultsBase:
@@ -213,6 +382,9 @@ class EventModel(EventModelDefaultsBase, EventModelBase):
         except ValueError:  # sindec already exist
             self._sim = sim
 
+        self._data = add_unit_vectors(self._data)
+        self._sim = add_unit_vectors(self._sim)
+
         self._source = source
         min_mjd = np.min(self._data['time'])
         max_mjd = np.max(self._data['time'])
@@ -277,7 +449,11 @@ class EventModel(EventModelDefaultsBase, EventModelBase):
 
         return Spline(bin_centers, hist, *args, **kwargs)
 
-    def _init_reduced_sim(self, source: sources.Source) -> None:
+    def _init_reduced_sim(
+        self,
+        source: sources.Source,
+        rng: Optional[np.random.Generator] = None,
+    ) -> None:
         """Gets a small simulation dataset to use for injecting signal.
 
         Prunes the simulation set to only events close to a given source and
@@ -286,6 +462,7 @@ class EventModel(EventModelDefaultsBase, EventModelBase):
 
         Args:
             source:
+            rng: The random number generator to assign sim times with.
 
         Returns:
             A reweighted simulation set around the source declination.
@@ -295,15 +472,21 @@ class EventModel(EventModelDefaultsBase, EventModelBase):
         else:
             self._reduced_sim = self._sim.copy()
         self._reduced_sim = self._weight_reduced_sim(self._reduced_sim)
-        self._randomize_sim_times()
+        self._randomize_sim_times(rng)
 
-    def _randomize_sim_times(self) -> None:
+    def _randomize_sim_times(
+        self,
+        rng: Optional[np.random.Generator] = None,
+    ) -> None:
         """Docstring"""
+        if rng is None:
+            rng = np.random.default_rng()
+
         # Randomly assign times to the simulation events within the data time
         # range.
         min_time = np.min(self._data['time'])
         max_time = np.max(self._data['time'])
-        self._reduced_sim['time'] = np.random.uniform(
+        self._reduced_sim['time'] = rng.uniform(
             min_time, max_time, size=len(self._reduced_sim))
 
     def _cut_sim_truedec(self, source: sources.Source) -> None:
@@ -353,57 +536,166 @@ class EventModel(EventModelDefaultsBase, EventModelBase):
         bg_densities = self._background_dec_spline(events['sindec'])
         return (1 / (2 * np.pi)) * bg_densities
 
-    def inject_background_events(self) -> np.ndarray:
+    def inject_background_events(
+        self,
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.ndarray:
         """Injects background events for a trial.
 
         Args:
-            event_model: Preprocessed data and simulation.
+            rng: The random number generator to inject with.
 
         Returns:
             An array of injected background events.
         """
+        if rng is None:
+            rng = np.random.default_rng()
+
         # Get the number of events we see from these runs
-        n_background_observed = np.random.poisson(self._n_background)
+        n_background_observed = rng.poisson(self._n_background)
 
         # How many events should we add in? This will now be based on the
         # total number of events actually observed during these runs
-        background = np.random.choice(self._data, n_background_observed).copy()
+        background = self._data[
+            rng.integers(len(self._data), size=n_background_observed)]
 
         # Randomize the background RA
-        background['ra'] = np.random.uniform(0, 2 * np.pi, len(background))
+        background['ra'] = rng.uniform(0, 2 * np.pi, len(background))
+        _set_ra_unit_vectors(background)
 
         return background
 
+    def inject_background_trials(
+        self,
+        n_trials: int,
+        rng: Optional[np.random.Generator] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Injects background events for many trials at once.
+
+        Draws the Poisson counts, data indices, and RAs for every trial in
+        single vectorized calls.
+
+        Args:
+            n_trials: The number of trials to inject.
+            rng: The random number generator to inject with.
+
+        Returns:
+            An array of the injected background events for all trials, ordered
+            by trial, and an array of the number of events in each trial.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+
+        n_background_observed = rng.poisson(self._n_background, size=n_trials)
+
+        idxs = rng.integers(
+            len(self._data),
+            size=n_background_observed.sum(),
+        )
+
+        background = self._data[idxs]
+        background['ra'] = rng.uniform(0, 2 * np.pi, len(background))
+        _set_ra_unit_vectors(background)
+
+        return background, n_background_observed
+
     def inject_signal_events(
         self,
         flux_norm: float,
         n_signal_observed: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None,
     ) -> np.ndarray:
         """Injects signal events for a trial.
 
         Args:
             flux_norm:
             n_signal_observed:
+            rng: The random number generator to inject with.
 
         Returns:
             An array of injected signal events.
         """
+        if rng is None:
+            rng = np.random.default_rng()
 
         # Pick the signal events
         total = self._reduced_sim['weight'].sum()
 
         if n_signal_observed is None:
-            n_signal_observed = scipy.stats.poisson.rvs(total * flux_norm)
+            n_signal_observed = rng.poisson(total * flux_norm)
 
-        signal = np.random.choice(
-            self._reduced_sim,
+        signal = self._reduced_sim[rng.choice(
+            len(self._reduced_sim),
             n_signal_observed,
             p=self._reduced_sim['weight'] / total,
             replace=False,
-        ).copy()
+        )]
+
+        return self._move_signal_to_source(signal, rng)
+
+    def inject_signal_trials(
+        self,
+        n_trials: int,
+        flux_norm: float,
+        n_signal_observed: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Injects signal events for many trials at once.
+
+        The Poisson counts, source locations, and rotations are done in single
+        vectorized calls. Events are still drawn without replacement within
+        each trial, so only that draw loops over the trials with signal.
+
+        Args:
+            n_trials: The number of trials to inject.
+            flux_norm:
+            n_signal_observed: If given, the fixed number of signal events in
+                every trial.
+            rng: The random number generator to inject with.
+
+        Returns:
+            An array of the injected signal events for all trials, ordered by
+            trial, and an array of the number of events in each trial.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+
+        total = self._reduced_sim['weight'].sum()
+
+        if n_signal_observed is None:
+            n_signal = rng.poisson(total * flux_norm, size=n_trials)
+        else:
+            n_signal = np.full(n_trials, n_signal_observed, dtype=int)
+
+        p = self._reduced_sim['weight'] / total
+        idxs = [
+            rng.choice(len(self._reduced_sim), n, p=p, replace=False)
+            for n in n_signal[n_signal > 0]
+        ]
+
+        if idxs:
+            signal = self._reduced_sim[np.concatenate(idxs)]
+        else:
+            signal = self._reduced_sim[:0].copy()
+
+        return self._move_signal_to_source(signal, rng), n_signal
 
+    def _move_signal_to_source(
+        self,
+        signal: np.ndarray,
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.ndarray:
+        """Rotates injected signal events onto sampled source locations.
+
+        Args:
+            signal: An array of signal events drawn from the reduced sim.
+            rng: The random number generator to sample source locations with.
+
+        Returns:
+            The rotated signal events.
+        """
         if len(signal) > 0:
-            ra, dec = self._source.sample_location(len(signal))
+            ra, dec = self._source.sample_location(len(signal), rng)
 
             signal['ra'], signal['dec'] = rotate(
                 signal['trueRa'],
@@ -425,24 +717,35 @@ class EventModel(EventModelDefaultsBase, EventModelBase):
 
             signal['sindec'] = np.sin(signal['dec'])
 
+            if 'x' in signal.dtype.names:
+                signal['x'], signal['y'], signal['z'] = unit_vector(
+                    signal['ra'], signal['dec'])
+
         return signal
 
-    def scramble_times(self, times: np.ndarray,
-                       background: bool = True) -> np.ndarray:
+    def scramble_times(
+        self,
+        times: np.ndarray,
+        background: bool = True,
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.ndarray:
         """Docstring"""
+        if rng is None:
+            rng = np.random.default_rng()
+
         p = None
 
         if background:
             p = self._grl_rates / self._grl_rates.sum()
 
-        runs = np.random.choice(
-            self._grl,
+        runs = self._grl[rng.choice(
+            len(self._grl),
             size=len(times),
             replace=True,
             p=p,
-        )
+        )]
 
-        return np.random.uniform(runs['start'], runs['stop'])
+        return rng.uniform(runs['start'], runs['stop'])
 
     @property
     def gamma(self) -> float:
@@ -621,9 +924,16 @@ class TdEventModel(EventModel, TdEventModelDefaultsBase, EventModelBase):
 
         return contained_livetime
 
-    def scramble_times(self, times: np.ndarray,
-                       background: bool = True) -> np.ndarray:
+    def scramble_times(
+        self,
+        times: np.ndarray,
+        background: bool = True,
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.ndarray:
         """Docstring"""
+        if rng is None:
+            rng = np.random.default_rng()
+
         if background:
             profile = self.background_time_profile
         else:
@@ -640,11 +950,16 @@ class TdEventModel(EventModel, TdEventModelDefaultsBase, EventModelBase):
         if background:
             grl_weighted_rates *= self._grl_rates[valid]
 
-        runs = np.random.choice(
-            self._grl[valid],
+        valid_grl = self._grl[valid]
+        runs = valid_grl[rng.choice(
+            len(valid_grl),
             size=len(times),
             replace=True,
             p=grl_weighted_rates / grl_weighted_rates.sum(),
-        )
+        )]
 
-        return profile.inverse_transform_sample(runs['start'], runs['stop'])
+        return profile.inverse_transform_sample(
+            runs['start'],
+            runs['stop'],
+            rng,
+        )
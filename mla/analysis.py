@@ -12,12 +12,17 @@ __maintainer__ = 'John Evans'
 __email__ = 'john.evans@icecube.wisc.edu'
 __status__ = 'Development'
 
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from typing_extensions import Protocol
 
+import concurrent.futures
 import copy
 import dataclasses
 import functools
+import itertools
+import json
+import os
+import pickle
 import warnings
 import numpy as np
 import numpy.lib.recfunctions as rf
@@ -26,6 +31,7 @@ import scipy.optimize
 from . import test_statistics
 from . import _models
 from . import sources
+from . import ts_distribution
 
 
 class Minimizer(Protocol):
@@ -49,6 +55,61 @@ class Analysis:
     test_statistic: test_statistics.LLHTestStatistic
     source: sources.Source
 
+    def save(self, path: str) -> None:
+        """Saves the analysis to a directory that load() can read.
+
+        The model is saved with its own save() to the model subdirectory, and
+        the test-statistic and source are pickled.
+
+        Args:
+            path: The directory to save to. It is created if needed.
+        """
+        self.model.save(os.path.join(path, 'model'))
+
+        with open(os.path.join(path, 'analysis.pkl'), 'wb') as analysis_file:
+            pickle.dump(
+                {'test_statistic': self.test_statistic, 'source': self.source},
+                analysis_file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+        with open(os.path.join(path, 'manifest.json'), 'w') as manifest_file:
+            json.dump(
+                {'format_version': _models.SAVE_FORMAT_VERSION},
+                manifest_file,
+                indent=2,
+            )
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = 'c') -> 'Analysis':
+        """Loads an analysis saved by save().
+
+        Args:
+            path: The directory the analysis was saved to.
+            mmap_mode: Passed on to the load() of the model.
+
+        Returns:
+            The analysis.
+
+        Raises:
+            ValueError: If the directory was saved in another format version.
+        """
+        with open(os.path.join(path, 'manifest.json')) as manifest_file:
+            manifest = json.load(manifest_file)
+
+        if manifest['format_version'] != _models.SAVE_FORMAT_VERSION:
+            raise ValueError(
+                f'Cannot load format version {manifest["format_version"]}.')
+
+        with open(os.path.join(path, 'analysis.pkl'), 'rb') as analysis_file:
+            parts = pickle.load(analysis_file)
+
+        return cls(
+            model=_models.EventModelBase.load(
+                os.path.join(path, 'model'), mmap_mode=mmap_mode),
+            **parts,
+        )
+
 
 def generate_params(**kwargs) -> np.ndarray:
     """Docstring"""
@@ -89,9 +150,25 @@ def _default_minimizer(
     bounds=None,
     gridsearch=False,
     gridsearch_points=5,
+    gridsearch_refinements=0,
+    gridsearch_starts=1,
+    analytic_gradient=True,
     **kwargs,
 ) -> scipy.optimize.OptimizeResult:
-    """Docstring"""
+    """Docstring
+
+    Args:
+        gridsearch: If True, seed the fit from a grid search over the bounds.
+        gridsearch_points: The number of grid points along each parameter.
+        gridsearch_refinements: The number of times to zoom a new grid into
+            the cell around the best grid point.
+        gridsearch_starts: The number of grid local minima to start fits
+            from. The best fit is returned, and all grid local minima are
+            stored in the result as grid_minima.
+        analytic_gradient: If True and every term of the test-statistic has
+            an analytic gradient, pass it to L-BFGS-B instead of using finite
+            differences.
+    """
     f = functools.partial(
         _unstructured_ts,
         ts=ts,
@@ -99,24 +176,151 @@ def _default_minimizer(
         unstructured_param_names=unstructured_param_names,
         **kwargs,
     )
-    x0 = unstructured_params
+    x0s = [unstructured_params]
+    grid_minima = None
     if gridsearch:
-        grid = (np.linspace(a, b, gridsearch_points)
-                for (a, b) in bounds)
-        points = np.array(np.meshgrid(*grid)).T
-        results = np.zeros(len(points))
-        for i, p in enumerate(points):
-            results[i] = f(p)
-        x0 = points[results.argmin()]  # pylint: disable=unsubscriptable-object
-    result = scipy.optimize.minimize(
-        f,
-        x0=x0,
-        bounds=bounds,
-        method='L-BFGS-B',
-    )
+        grid_minima = _gridsearch(
+            ts,
+            structured_params,
+            unstructured_param_names,
+            bounds,
+            gridsearch_points,
+            gridsearch_refinements,
+            **kwargs,
+        )
+        x0s = grid_minima[:gridsearch_starts]
+
+    jac = False
+    if analytic_gradient and ts.has_gradient:
+        f = functools.partial(
+            _unstructured_ts_and_gradient,
+            ts=ts,
+            structured_params=structured_params,
+            unstructured_param_names=unstructured_param_names,
+            **kwargs,
+        )
+        jac = True
+
+    results = [
+        scipy.optimize.minimize(
+            f,
+            x0=x0,
+            jac=jac,
+            bounds=bounds,
+            method='L-BFGS-B',
+        )
+        for x0 in x0s
+    ]
+    result = min(results, key=lambda res: res.fun)
+
+    # Leave the structured params at the best fit, not the last one tried.
+    for name, val in zip(unstructured_param_names, result.x):
+        structured_params[name] = val
+
+    if grid_minima is not None:
+        result.grid_minima = grid_minima
     return result
 
 
+def _gridsearch(
+    ts: test_statistics.LLHTestStatistic,
+    structured_params: np.ndarray,
+    unstructured_param_names: List[str],
+    bounds: test_statistics.Bounds,
+    points: int,
+    refinements: int,
+    **kwargs,
+) -> np.ndarray:
+    """Finds starting points for a fit by evaluating a grid in one batch.
+
+    Every grid point is evaluated with a single call to
+    LLHTestStatistic.evaluate_batch(). The best point can then be refined by
+    repeatedly evaluating a new grid spanning the cells next to it.
+
+    Args:
+        ts: A preprocessed test-statistic.
+        structured_params: The current parameters, including any that are not
+            fit.
+        unstructured_param_names: The names of the parameters to search.
+        bounds: The (finite) bounds of each searched parameter.
+        points: The number of grid points along each parameter.
+        refinements: The number of refinement grids to evaluate.
+
+    Returns:
+        An array of starting points of shape (n_minima, n_params), sorted
+        from best to worst: the refined best point, then the other local
+        minima of the coarse grid.
+
+    Raises:
+        ValueError: If any of the bounds are not finite.
+    """
+    lower, upper = np.array(bounds, dtype=float).T
+
+    if not np.all(np.isfinite([lower, upper])):
+        raise ValueError('Grid searches require finite bounds.')
+
+    grid, ts_grid = _evaluate_grid(
+        ts, structured_params, unstructured_param_names,
+        lower, upper, points, **kwargs)
+
+    # A grid point is a local minimum if no neighbor along any axis is lower
+    padded = np.pad(ts_grid, 1, mode='constant', constant_values=np.inf)
+    is_minimum = np.ones(ts_grid.shape, dtype=bool)
+    for axis in range(ts_grid.ndim):
+        for shift in (-1, 1):
+            neighbors = np.roll(padded, shift, axis=axis)[
+                (slice(1, -1),) * ts_grid.ndim]
+            is_minimum &= ts_grid <= neighbors
+
+    order = np.argsort(ts_grid[is_minimum], kind='stable')
+    minima = grid[is_minimum][order]
+
+    best, best_ts = minima[0], ts_grid[is_minimum][order[0]]
+    step = (upper - lower) / max(1, points - 1)
+    for _ in range(refinements):
+        low = np.maximum(lower, best - step)
+        high = np.minimum(upper, best + step)
+        fine_grid, fine_ts = _evaluate_grid(
+            ts, structured_params, unstructured_param_names,
+            low, high, points, **kwargs)
+        if fine_ts.min() <= best_ts:
+            best = fine_grid.reshape((-1, len(lower)))[fine_ts.argmin()]
+            best_ts = fine_ts.min()
+        step = (high - low) / max(1, points - 1)
+
+    minima[0] = best
+    return minima
+
+
+def _evaluate_grid(
+    ts: test_statistics.LLHTestStatistic,
+    structured_params: np.ndarray,
+    unstructured_param_names: List[str],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    points: int,
+    **kwargs,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Evaluates the test-statistic on a regular grid in one batch.
+
+    Returns:
+        The grid of shape (points, ..., points, n_params) and the
+        test-statistic at each grid point, of shape (points, ..., points).
+    """
+    axes = [np.linspace(a, b, points) for a, b in zip(lower, upper)]
+    grid = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1)
+
+    grid_params = np.repeat(
+        np.reshape(structured_params, (1,)),
+        grid[..., 0].size,
+    )
+    for i, name in enumerate(unstructured_param_names):
+        grid_params[name] = grid[..., i].reshape((-1,))
+
+    ts_grid, _ = ts.evaluate_batch(grid_params, **kwargs)
+    return grid, ts_grid.reshape(grid.shape[:-1])
+
+
 def _unstructured_ts(
     unstructured_params: np.array,
     ts: test_statistics.LLHTestStatistic,
@@ -131,6 +335,24 @@ def _unstructured_ts(
     return ts(structured_params, **kwargs)
 
 
+def _unstructured_ts_and_gradient(
+    unstructured_params: np.array,
+    ts: test_statistics.LLHTestStatistic,
+    structured_params: np.array,
+    unstructured_param_names: List[str],
+    **kwargs,
+) -> Tuple[float, Optional[np.ndarray]]:
+    """Docstring"""
+    for name, val in zip(unstructured_param_names, unstructured_params):
+        structured_params[name] = val
+
+    return ts.value_and_gradient(
+        structured_params,
+        unstructured_param_names,
+        **kwargs,
+    )
+
+
 def minimize_ts(
     analysis: Analysis,
     events: np.ndarray,
@@ -141,6 +363,7 @@ def minimize_ts(
     ts: Optional[test_statistics.LLHTestStatistic] = None,
     verbose: bool = False,
     as_array: bool = False,
+    preprocessed: bool = False,
     **kwargs,
 ) -> Dict[str, float]:
     """Calculates the params that minimize the ts for the given events.
@@ -153,9 +376,13 @@ def minimize_ts(
     Args:
         analysis:
         test_params:
-        events:
+        events: The events of the trial. Ignored if preprocessed.
         minimizer:
         verbose:
+        preprocessed: If True, ts has already been preprocessed with these
+            events (e.g. with LLHTestStatistic.with_events()) and is only
+            updated to the test params. The bounds given when it was
+            preprocessed are used.
 
     Returns:
         A dictionary containing the minimized overall test-statistic, the
@@ -171,6 +398,10 @@ def minimize_ts(
             FutureWarning,
         )
 
+    # The minimizers write into the structured params, so work on a copy to
+    # keep one trial's fit from seeding the next trial's starting point.
+    test_params = test_params.copy()
+
     if to_fit == 'all':
         to_fit = list(test_params.dtype.names)
     elif to_fit is None:
@@ -190,16 +421,21 @@ def minimize_ts(
     if verbose:
         print('Preprocessing...', end='', flush=True)
 
-    if ts is None:
-        ts = copy.deepcopy(analysis.test_statistic)
-
-    ts.preprocess(
-        test_params[0],
-        events,
-        analysis.model,
-        analysis.source,
-        bounds=bounds,
-    )
+    if preprocessed:
+        if ts is None:
+            raise ValueError('A preprocessed ts must be given.')
+        ts.update(test_params[0])
+    else:
+        if ts is None:
+            ts = copy.deepcopy(analysis.test_statistic)
+
+        ts.preprocess(
+            test_params[0],
+            events,
+            analysis.model,
+            analysis.source,
+            bounds=bounds,
+        )
 
     if ts.n_kept == 0:
         if as_array:
@@ -218,13 +454,12 @@ def minimize_ts(
     if verbose:
         print('done')
 
+    if to_fit == ['empty']:
+        return _evaluate_without_fitting(ts, test_params, as_array, **kwargs)
+
     tuple_names = None
     if as_array:
-        tuple_names = ['ts']
-        if 'ns' not in to_fit:
-            tuple_names.append('ns')
-        if to_fit != ['empty']:
-            tuple_names.extend(to_fit)
+        tuple_names = _result_names(test_params)
 
     minimize = functools.partial(
         _minimizer_wrapper,
@@ -244,14 +479,60 @@ def minimize_ts(
     if as_array:
         return np.array(
             return_list,
-            dtype=[
-                ('ts', np.float64),
-                *[(name, np.float64) for name in test_params.dtype.names],
-            ],
+            dtype=[(name, np.float64) for name in tuple_names],
         )
     return return_list
 
 
+def _result_names(test_params: np.ndarray) -> List[str]:
+    """The fields of the array returned by minimize_ts(as_array=True).
+
+    The best-fit ns is always included, whether or not it was a test param.
+    """
+    return [
+        'ts',
+        *(['ns'] if 'ns' not in test_params.dtype.names else []),
+        *test_params.dtype.names,
+    ]
+
+
+def _evaluate_without_fitting(
+    ts: test_statistics.LLHTestStatistic,
+    test_params: np.ndarray,
+    as_array: bool,
+    **kwargs,
+) -> Union[np.ndarray, List[dict]]:
+    """Evaluates every row of test_params at once with no fitting.
+
+    Gives the same output as calling _minimizer_wrapper() on each row with
+    nothing to fit, using LLHTestStatistic.evaluate_batch().
+    """
+    ts_vals, ns_vals = ts.evaluate_batch(test_params, **kwargs)
+
+    # Like ts.best_ns, only an improvement over the null hypothesis counts.
+    ns_vals = np.where(ts_vals < 0, ns_vals, 0)
+
+    if as_array:
+        results = np.empty(
+            len(test_params),
+            dtype=[(name, np.float64) for name in _result_names(test_params)],
+        )
+        results['ts'] = -ts_vals
+        for name in test_params.dtype.names:
+            results[name] = test_params[name]
+        results['ns'] = ns_vals
+        return results
+
+    return [
+        {
+            **{name: params[name] for name in test_params.dtype.names},
+            'ts': -ts_val,
+            'ns': ns_val,
+        }
+        for params, ts_val, ns_val in zip(test_params, ts_vals, ns_vals)
+    ]
+
+
 def _minimizer_wrapper(
     unstructured_params: np.array,
     structured_params: np.ndarray,
@@ -301,10 +582,7 @@ def _minimizer_wrapper(
             print('done')
 
     if tuple_names is not None:
-        return tuple(
-            output[name]
-            for name in ['ts', *structured_params.dtype.names]
-        )
+        return tuple(output[name] for name in tuple_names)
 
     return output
 
@@ -315,6 +593,7 @@ def produce_trial(
         random_seed: Optional[int] = None,
         n_signal_observed: Optional[int] = None,
         verbose: bool = False,
+        rng: Optional[np.random.Generator] = None,
         **kwargs,
 ) -> np.ndarray:
     """Produces a single trial of background+signal events based on inputs.
@@ -322,9 +601,10 @@ def produce_trial(
     Args:
         analysis:
         flux_norm: A flux normaliization to adjust weights.
-        random_seed: A seed value for the numpy RNG.
+        random_seed: A seed value for the numpy RNG. Ignored if rng is given.
         n_signal_observed:
         verbose: A flag to print progress.
+        rng: The random number generator to produce the trial with.
 
     Returns:
         An array of combined signal and background events.
@@ -332,23 +612,22 @@ def produce_trial(
     # kwargs no-op
     len(kwargs)
 
-    if random_seed is not None:
-        np.random.seed(random_seed)
+    if rng is None:
+        rng = np.random.default_rng(random_seed)
 
-    background = analysis.model.inject_background_events()
-    background['time'] = analysis.model.scramble_times(background['time'])
+    background = analysis.model.inject_background_events(rng)
+    background['time'] = analysis.model.scramble_times(
+        background['time'],
+        rng=rng,
+    )
 
     if flux_norm > 0 or n_signal_observed is not None:
-        signal = analysis.model.inject_signal_events(
+        signal = produce_signal(
+            analysis,
             flux_norm,
             n_signal_observed,
+            rng=rng,
         )
-
-        signal['time'] = analysis.model.scramble_times(
-            signal['time'],
-            background=False,
-        )
-
     else:
         signal = np.empty(0, dtype=background.dtype)
 
@@ -370,28 +649,352 @@ def produce_trial(
     return events
 
 
+def produce_signal(
+        analysis: Analysis,
+        flux_norm: float = 0,
+        n_signal_observed: Optional[int] = None,
+        dtype: Optional[np.dtype] = None,
+        random_seed: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None,
+        **kwargs,
+) -> np.ndarray:
+    """Produces only the signal events of a trial.
+
+    Together with LLHTestStatistic.with_events(), this lets signal be
+    injected on top of a background trial that was preprocessed once.
+
+    Args:
+        analysis:
+        flux_norm: A flux normaliization to adjust weights.
+        n_signal_observed:
+        dtype: If given, the events are converted to this dtype (e.g. the
+            dtype of the data events), dropping the other fields.
+        random_seed: A seed value for the numpy RNG. Ignored if rng is given.
+        rng: The random number generator to produce the signal with.
+
+    Returns:
+        An array of signal events with scrambled times.
+    """
+    # kwargs no-op
+    len(kwargs)
+
+    if rng is None:
+        rng = np.random.default_rng(random_seed)
+
+    signal = analysis.model.inject_signal_events(
+        flux_norm,
+        n_signal_observed,
+        rng,
+    )
+
+    signal['time'] = analysis.model.scramble_times(
+        signal['time'],
+        background=False,
+        rng=rng,
+    )
+
+    if dtype is None:
+        return signal
+
+    data_signal = np.empty(len(signal), dtype=dtype)
+    for name in data_signal.dtype.names:
+        data_signal[name] = signal[name]
+    return data_signal
+
+
+def produce_trials(
+        analysis: Analysis,
+        n_trials: int,
+        flux_norm: float = 0,
+        random_seed: Optional[int] = None,
+        n_signal_observed: Optional[int] = None,
+        verbose: bool = False,
+        rng: Optional[np.random.Generator] = None,
+        **kwargs,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Produces many trials of background+signal events in one batch.
+
+    All of the Poisson counts, event indices, RAs, and times for every trial
+    are drawn in a few vectorized calls instead of once per trial. Within each
+    trial, the background events come before the signal events, as in
+    produce_trial().
+
+    Args:
+        analysis:
+        n_trials: The number of trials to produce.
+        flux_norm: A flux normaliization to adjust weights.
+        random_seed: A seed value for the numpy RNG. Ignored if rng is given.
+        n_signal_observed:
+        verbose: A flag to print progress.
+        rng: The random number generator to produce the trial with.
+
+    Returns:
+        A flat array of the events of every trial, and an array of trial
+        offsets of length n_trials + 1, such that the events of trial i are
+        events[offsets[i]:offsets[i + 1]].
+    """
+    # kwargs no-op
+    len(kwargs)
+
+    if rng is None:
+        rng = np.random.default_rng(random_seed)
+
+    background, n_background = analysis.model.inject_background_trials(
+        n_trials,
+        rng,
+    )
+    background['time'] = analysis.model.scramble_times(
+        background['time'],
+        rng=rng,
+    )
+
+    if flux_norm > 0 or n_signal_observed is not None:
+        signal, n_signal = analysis.model.inject_signal_trials(
+            n_trials,
+            flux_norm,
+            n_signal_observed,
+            rng,
+        )
+
+        signal['time'] = analysis.model.scramble_times(
+            signal['time'],
+            background=False,
+            rng=rng,
+        )
+    else:
+        signal = np.empty(0, dtype=background.dtype)
+        n_signal = np.zeros(n_trials, dtype=int)
+
+    if verbose:
+        print(f'number of background events: {len(background)}')
+        print(f'number of signal events: {len(signal)}')
+
+    offsets = np.zeros(n_trials + 1, dtype=int)
+    np.cumsum(n_background + n_signal, out=offsets[1:])
+
+    if len(signal) == 0:
+        # The background events are already ordered by trial.
+        return background, offsets
+
+    # Because we want to return the entire event and not just the
+    # number of events, we need to remove the fields in the simulated
+    # events that are not present in the data events. Fields are copied by
+    # name because the signal events carry them in a different order.
+    data_signal = np.empty(len(signal), dtype=background.dtype)
+    for name in background.dtype.names:
+        data_signal[name] = signal[name]
+
+    # Scatter each trial's background events, then its signal events, into
+    # that trial's slice of a single preallocated array.
+    events = np.empty(offsets[-1], dtype=background.dtype)
+    events[_trial_positions(offsets[:-1], n_background)] = background
+    events[_trial_positions(offsets[:-1] + n_background, n_signal)] = (
+        data_signal)
+
+    return events, offsets
+
+
+def _trial_positions(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Gets the flat array positions of trial-ordered blocks of events.
+
+    Args:
+        starts: The position of the first event of each trial's block.
+        counts: The number of events in each trial's block.
+
+    Returns:
+        An array of positions of length counts.sum().
+    """
+    block_starts = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) + np.repeat(starts - block_starts, counts)
+
+
+def iterate_trials(
+    events: np.ndarray,
+    offsets: np.ndarray,
+) -> Iterator[np.ndarray]:
+    """Iterates over the trials of a produce_trials() output without copying.
+
+    Args:
+        events: The flat array of events for every trial.
+        offsets: The trial offsets returned with the events.
+
+    Yields:
+        A view of the events of each trial.
+    """
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        yield events[start:stop]
+
+
 def produce_and_minimize(
     analysis: Analysis,
     n_trials: int = 1,
     as_array: bool = False,
+    batch_size: Optional[int] = None,
+    n_jobs: int = 1,
+    random_seed: Optional[Union[int, np.random.SeedSequence]] = None,
+    accumulator: Optional[ts_distribution.TSAccumulator] = None,
     **kwargs,
-) -> List[Dict[str, float]]:
-    """Docstring"""
+) -> Union[List[Dict[str, float]], ts_distribution.TSAccumulator]:
+    """Produces and minimizes trials, optionally in a pool of processes.
+
+    Every trial (or every batch of trials, if batch_size is given) gets its
+    own np.random.Generator spawned from np.random.SeedSequence(random_seed).
+    The results are then identical for any number of workers, and are always
+    returned in trial order.
+
+    Args:
+        analysis:
+        n_trials: The number of trials to produce and minimize.
+        as_array:
+        batch_size: If given, trials are produced this many at a time with
+            produce_trials() instead of one at a time with produce_trial().
+        n_jobs: The number of worker processes to use. The analysis is sent
+            to each worker once. A value of -1 uses all available CPUs.
+        random_seed: A seed value or SeedSequence to spawn the trial RNG
+            streams from.
+        accumulator: If given, the test-statistic of every result is added to
+            this accumulator as the trials are minimized, and the results
+            themselves are not kept.
+
+    Returns:
+        The minimization results of every trial, in trial order, or the
+        accumulator if one was given.
+    """
+    if batch_size is None:
+        sizes = [1] * n_trials
+    else:
+        sizes = [
+            min(batch_size, n_trials - start)
+            for start in range(0, n_trials, batch_size)
+        ]
+
+    if not isinstance(random_seed, np.random.SeedSequence):
+        random_seed = np.random.SeedSequence(random_seed)
+
+    units = list(zip(sizes, random_seed.spawn(len(sizes))))
+    batched = batch_size is not None
+
+    if not units:
+        if accumulator is not None:
+            return accumulator
+        if as_array:
+            test_params = kwargs.get(
+                'test_params', np.empty(0, dtype=[('empty', int)]))
+            return np.empty(0, dtype=[
+                (name, np.float64) for name in _result_names(test_params)])
+        return []
+
+    if n_jobs == 1:
+        return_list = _minimize_units(
+            analysis, units, batched, as_array, kwargs, accumulator)
+    else:
+        if n_jobs < 0:
+            n_jobs = os.cpu_count()
+
+        tasks = [
+            [units[i] for i in idxs]
+            for idxs in np.array_split(
+                np.arange(len(units)),
+                max(1, min(len(units), 4 * n_jobs)),
+            )
+        ]
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_worker,
+            initargs=(analysis,),
+        ) as executor:
+            results = executor.map(
+                _worker_minimize_units,
+                tasks,
+                itertools.repeat(batched),
+                itertools.repeat(as_array),
+                itertools.repeat(kwargs),
+                itertools.repeat(
+                    None if accumulator is None else accumulator.copy_empty()),
+            )
+
+            if accumulator is not None:
+                for task_accumulator in results:
+                    accumulator.merge(task_accumulator)
+            else:
+                return_list = [result for task in results for result in task]
+
+    if accumulator is not None:
+        return accumulator
+    if as_array:
+        return np.concatenate(return_list)
+    return return_list
+
+
+def _minimize_units(
+    analysis: Analysis,
+    units: List[Tuple[int, np.random.SeedSequence]],
+    batched: bool,
+    as_array: bool,
+    kwargs: dict,
+    accumulator: Optional[ts_distribution.TSAccumulator] = None,
+) -> Union[list, ts_distribution.TSAccumulator]:
+    """Produces and minimizes the trials of a list of (size, seed) units.
+
+    Each unit is one trial, or one batch of trials when batched is True, and
+    is produced with a generator seeded from the unit's SeedSequence. If an
+    accumulator is given, only the test-statistics are kept, in it.
+    """
     ts = copy.deepcopy(analysis.test_statistic)
-    return_list = [
-        minimize_ts(
-            analysis,
-            produce_trial(
+    return_list = []
+
+    for size, seed in units:
+        rng = np.random.default_rng(seed)
+
+        if batched:
+            trials = iterate_trials(
+                *produce_trials(analysis, size, rng=rng, **kwargs))
+        else:
+            trials = [produce_trial(analysis, rng=rng, **kwargs)]
+
+        results = (
+            minimize_ts(
                 analysis,
+                trial,
+                ts=ts,
+                as_array=as_array,
                 **kwargs,
-            ),
-            ts=ts,
-            as_array=as_array,
-            **kwargs,
+            )
+            for trial in trials
         )
-        for _ in range(n_trials)
-    ]
 
-    if as_array:
-        return np.concatenate(return_list)
+        if accumulator is None:
+            return_list.extend(results)
+            continue
+
+        for result in results:
+            if as_array:
+                accumulator.add(result['ts'])
+            else:
+                accumulator.add([row['ts'] for row in result])
+
+    if accumulator is not None:
+        return accumulator
     return return_list
+
+
+_WORKER_ANALYSIS: Optional[Analysis] = None
+
+
+def _init_worker(analysis: Analysis) -> None:
+    """Stores the analysis once per worker process."""
+    global _WORKER_ANALYSIS
+    _WORKER_ANALYSIS = analysis
+
+
+def _worker_minimize_units(
+    units: List[Tuple[int, np.random.SeedSequence]],
+    batched: bool,
+    as_array: bool,
+    kwargs: dict,
+    accumulator: Optional[ts_distribution.TSAccumulator],
+) -> Union[list, ts_distribution.TSAccumulator]:
+    """Runs _minimize_units() in a worker on the worker's analysis."""
+    return _minimize_units(
+        _WORKER_ANALYSIS, units, batched, as_array, kwargs, accumulator)
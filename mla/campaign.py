@@ -0,0 +1,248 @@
+"""
+A checkpointed runner for long trial campaigns. Results are written to disk in
+fixed-size chunks so that an interrupted campaign can resume from the last
+completed chunk.
+"""
+
+__author__ = 'John Evans'
+__copyright__ = 'Copyright 2020 John Evans'
+__credits__ = ['John Evans', 'Jason Fan', 'Michael Larson']
+__license__ = 'Apache License 2.0'
+__version__ = '0.0.1'
+__maintainer__ = 'John Evans'
+__email__ = 'john.evans@icecube.wisc.edu'
+__status__ = 'Development'
+
+from typing import Any, Iterator, List, Optional
+
+import json
+import os
+import time
+import numpy as np
+
+from dataclasses import dataclass
+from dataclasses import field
+from dataclasses import InitVar
+
+from . import analysis as mla_analysis
+
+
+@dataclass
+class TrialCampaign:
+    """Produces and minimizes trials in chunks, checkpointed to a directory.
+
+    Each chunk of trials is written to its own chunk_XXXXXX.npy file, and a
+    manifest.json file in the same directory records the campaign settings
+    (including trial_kwargs), the seed of every chunk, and how long each
+    completed chunk took. Chunks are written to a temporary file first and
+    then renamed, so a chunk file either exists completely or not at all.
+    Running a campaign again in the same directory skips the chunks that are
+    already done.
+
+    The trials of chunk i always use the i-th child of
+    np.random.SeedSequence(entropy), so the results do not depend on how many
+    times the campaign was interrupted or how many workers were used.
+
+    Attributes:
+        analysis (Analysis): The analysis to produce and minimize trials for.
+        directory (str): The directory holding the chunk files and manifest.
+        n_trials (int): The total number of trials in the campaign.
+        chunk_size (int): The number of trials per chunk file.
+        entropy (int): The entropy of the root SeedSequence of the campaign.
+        trial_kwargs (dict): Keyword arguments to pass on to
+            produce_and_minimize(), e.g. flux_norm or test_params.
+    """
+    analysis: mla_analysis.Analysis
+    directory: str
+    n_trials: int
+    chunk_size: int = 1000
+    random_seed: InitVar[Optional[int]] = None
+    trial_kwargs: dict = field(default_factory=dict)
+    entropy: int = field(init=False)
+    _manifest: dict = field(init=False, repr=False)
+
+    def __post_init__(self, random_seed: Optional[int]) -> None:
+        """Loads the manifest of an existing campaign or starts a new one.
+
+        Raises:
+            ValueError: If the directory holds a campaign with different
+                settings.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        trial_kwargs = _json_record(self.trial_kwargs)
+
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, 'r') as manifest_file:
+                self._manifest = json.load(manifest_file)
+
+            if random_seed is not None and (
+                self._manifest['entropy'] != random_seed
+            ):
+                raise ValueError(
+                    f'{self.directory} holds a campaign with a different seed.')
+
+            for key in ['n_trials', 'chunk_size']:
+                if self._manifest[key] != getattr(self, key):
+                    raise ValueError(
+                        f'{self.directory} holds a campaign with {key} = '
+                        f'{self._manifest[key]}.'
+                    )
+
+            if self._manifest.get('trial_kwargs', {}) != trial_kwargs:
+                raise ValueError(
+                    f'{self.directory} holds a campaign with trial_kwargs = '
+                    f'{self._manifest.get("trial_kwargs", {})}.'
+                )
+
+            self.entropy = self._manifest['entropy']
+            return
+
+        self.entropy = np.random.SeedSequence(random_seed).entropy
+        self._manifest = {
+            'n_trials': self.n_trials,
+            'chunk_size': self.chunk_size,
+            'entropy': self.entropy,
+            'trial_kwargs': trial_kwargs,
+            'chunks': {},
+        }
+        self._write_manifest()
+
+    @property
+    def _manifest_path(self) -> str:
+        """Docstring"""
+        return os.path.join(self.directory, 'manifest.json')
+
+    def _chunk_path(self, chunk: int) -> str:
+        """Docstring"""
+        return os.path.join(self.directory, f'chunk_{chunk:06d}.npy')
+
+    def _write_manifest(self) -> None:
+        """Atomically replaces the manifest file."""
+        tmp_path = f'{self._manifest_path}.tmp'
+        with open(tmp_path, 'w') as manifest_file:
+            json.dump(self._manifest, manifest_file, indent=2)
+        os.replace(tmp_path, self._manifest_path)
+
+    @property
+    def n_chunks(self) -> int:
+        """The number of chunks in the campaign."""
+        return -(-self.n_trials // self.chunk_size)
+
+    @property
+    def completed_chunks(self) -> List[int]:
+        """The indices of the chunks that have been written, in order."""
+        return sorted(int(chunk) for chunk in self._manifest['chunks'])
+
+    @property
+    def n_completed(self) -> int:
+        """The number of trials that have been written."""
+        return sum(
+            chunk['n_trials'] for chunk in self._manifest['chunks'].values())
+
+    @property
+    def done(self) -> bool:
+        """Whether every chunk has been written."""
+        return len(self._manifest['chunks']) == self.n_chunks
+
+    @property
+    def throughput(self) -> float:
+        """The number of trials per second over all completed chunks."""
+        seconds = sum(
+            chunk['seconds'] for chunk in self._manifest['chunks'].values())
+        if seconds == 0:
+            return 0
+        return self.n_completed / seconds
+
+    def run(
+        self,
+        max_chunks: Optional[int] = None,
+        verbose: bool = False,
+        **kwargs,
+    ) -> None:
+        """Produces and minimizes every chunk that has not been written yet.
+
+        Args:
+            max_chunks: If given, stop after writing this many chunks.
+            verbose: If True, print the throughput after each chunk.
+            **kwargs: Passed on to produce_and_minimize(), e.g. n_jobs or
+                batch_size. These do not change the results.
+        """
+        seeds = np.random.SeedSequence(self.entropy).spawn(self.n_chunks)
+        written = 0
+
+        for chunk, seed in enumerate(seeds):
+            if str(chunk) in self._manifest['chunks']:
+                continue
+
+            if max_chunks is not None and written >= max_chunks:
+                break
+
+            size = min(self.chunk_size, self.n_trials - chunk * self.chunk_size)
+            start = time.perf_counter()
+            results = mla_analysis.produce_and_minimize(
+                self.analysis,
+                n_trials=size,
+                as_array=True,
+                random_seed=seed,
+                **{**self.trial_kwargs, **kwargs},
+            )
+            seconds = time.perf_counter() - start
+
+            tmp_path = f'{self._chunk_path(chunk)}.tmp'
+            with open(tmp_path, 'wb') as chunk_file:
+                np.save(chunk_file, results)
+            os.replace(tmp_path, self._chunk_path(chunk))
+
+            self._manifest['chunks'][str(chunk)] = {
+                'n_trials': size,
+                'spawn_key': list(seed.spawn_key),
+                'seconds': seconds,
+            }
+            self._write_manifest()
+            written += 1
+
+            if verbose:
+                print(
+                    f'chunk {chunk + 1}/{self.n_chunks}: '
+                    f'{size / seconds:.2f} trials/s '
+                    f'({self.throughput:.2f} trials/s overall)'
+                )
+
+    def iter_chunks(
+        self,
+        mmap_mode: Optional[str] = 'r',
+    ) -> Iterator[np.ndarray]:
+        """Yields the results of each completed chunk, in order.
+
+        Args:
+            mmap_mode: Passed on to np.load(). By default each chunk is
+                memory-mapped read-only rather than read into memory.
+        """
+        for chunk in self.completed_chunks:
+            yield np.load(self._chunk_path(chunk), mmap_mode=mmap_mode)
+
+    def load(self) -> np.ndarray:
+        """Returns the results of every completed chunk as one array."""
+        chunks = list(self.iter_chunks())
+        if not chunks:
+            return np.empty(0)
+        return np.concatenate(chunks)
+
+
+def _json_record(value: Any) -> Any:
+    """Converts trial kwargs to the form they are stored in the manifest.
+
+    Arrays are stored with their dtype, and functions by their qualified
+    name. The value is passed through JSON, so that a record made now
+    compares equal to one loaded from a manifest.
+    """
+    def to_json(obj: Any) -> Any:
+        if isinstance(obj, np.ndarray):
+            return {'dtype': str(obj.dtype), 'values': obj.tolist()}
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if callable(obj):
+            return f'{obj.__module__}.{obj.__qualname__}'
+        return repr(obj)
+
+    return json.loads(json.dumps(value, sort_keys=True, default=to_json))
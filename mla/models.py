@@ -14,7 +14,11 @@ __status__ = 'Development'
 
 from typing import List, Optional, Tuple, Union
 
+import hashlib
+import os
+import tempfile
 import numpy as np
+import scipy.interpolate
 from scipy.interpolate import UnivariateSpline as Spline
 
 from dataclasses import dataclass
@@ -34,13 +38,20 @@ class _I3EventModelBase(_models.EventModelBase):
             maps.
         log_energy_bins (np.array): An array of log(energy) bin edges for the
             energy maps.
-        log_sob_gamma_splines (List[List[scipy.interpolate.UnivariateSpline]]):
-            A 2D list of spline fits of the log(signal-over-background) vs.
-            gamma at a binned energy and sin(dec).
+        log_sob_gamma_breaks (np.array): The gamma breakpoints of the
+            piecewise polynomial fits of the log(signal-over-background) vs.
+            gamma.
+        log_sob_gamma_coeffs (np.array): The polynomial coefficients of those
+            fits, of shape (intervals, order + 1, sin_dec_bins *
+            log_energy_bins), highest order first, for every energy and
+            sin(dec) bin, flattened in C order.
         """
     _sin_dec_bins: np.array = field(init=False)
     _log_energy_bins: np.array = field(init=False)
-    _log_sob_gamma_splines: List[List[Spline]] = field(init=False)
+    _gamma_bins: np.array = field(init=False)
+    _log_sob_gamma_breaks: np.array = field(init=False)
+    _log_sob_gamma_coeffs: np.array = field(init=False)
+    _built_dec_bands: np.array = field(init=False)
 
 
 @dataclass
@@ -50,6 +61,8 @@ class _I3EventModelDefaultsBase(_models.TdEventModelDefaultsBase):
     log_energy_bins: InitVar[Union[np.array, int]] = field(default=50)
     gamma_bins: InitVar[Union[np.array, int]] = field(default=50)
     verbose: InitVar[bool] = field(default=False)
+    cache_dir: InitVar[Optional[str]] = field(default=None)
+    lazy: InitVar[bool] = field(default=False)
 
 
 @dataclass
@@ -58,7 +71,19 @@ class I3EventModel(
     _I3EventModelDefaultsBase,
     _I3EventModelBase,
 ):
-    """Docstring"""
+    """Docstring
+
+    If cache_dir is given, the packed log(sob) table is saved there in a .npz
+    file named by a hash of everything it is built from (the data and sim
+    columns, the bins, and the gamma grid). Building a model from the same
+    inputs again then loads the table instead of rebuilding it.
+
+    If lazy is True, the table is not built up front. Instead, the table for
+    each sin(dec) band is built the first time log_sob_spline_prepro() finds
+    an event in that band, and then kept. An analysis of one source then only
+    builds the few bands around it. A cache_dir is still read in lazy mode,
+    but only a table built in full is written to it.
+    """
     def __post_init__(
         self,
         source: sources.Source,
@@ -74,6 +99,8 @@ class I3EventModel(
         log_energy_bins: Union[np.array, int],
         gamma_bins: Union[np.array, int],
         verbose: bool,
+        cache_dir: Optional[str],
+        lazy: bool,
     ) -> None:
         """Docstring"""
         super().__post_init__(
@@ -98,14 +125,128 @@ class I3EventModel(
 
         if isinstance(gamma_bins, int):
             gamma_bins = np.linspace(-4.25, -0.5, 1 + gamma_bins)
+        self._gamma_bins = gamma_bins
+        self._built_dec_bands = np.zeros(
+            len(self._sin_dec_bins) - 1, dtype=bool)
+
+        cache_path = None
+        if cache_dir is not None:
+            cache_path = os.path.join(
+                cache_dir, f'i3_energy_sob_{self._cache_key(gamma_bins)}.npz')
+
+        if cache_path is not None and os.path.exists(cache_path):
+            if verbose:
+                print(f'Loading signal-over-background table from {cache_path}')
+            with np.load(cache_path) as cached:
+                self._log_sob_gamma_breaks = cached['breaks']
+                self._log_sob_gamma_coeffs = cached['coeffs']
+            self._built_dec_bands[:] = True
+            return
+
+        self._log_sob_gamma_breaks = None
+        self._log_sob_gamma_coeffs = None
+        if lazy:
+            return
+
+        self._build_dec_bands(
+            np.arange(len(self._built_dec_bands)), verbose=verbose)
+
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            # A unique temporary file keeps processes that build the same
+            # table at once from writing into each other's files.
+            tmp_fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(tmp_fd, 'wb') as cache_file:
+                    np.savez(
+                        cache_file,
+                        breaks=self._log_sob_gamma_breaks,
+                        coeffs=self._log_sob_gamma_coeffs,
+                    )
+                os.replace(tmp_path, cache_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    def _cache_key(self, gamma_bins: np.array) -> str:
+        """Hashes every input of the log(sob) table.
+
+        The version string must be changed whenever the way the table is
+        built changes, so that old cache files are not used.
+        """
+        digest = hashlib.sha256(b'i3_energy_sob_v1')
+        for array in [
+            self._data['sindec'],
+            self._data['logE'],
+            self._sim['sindec'],
+            self._sim['logE'],
+            self._sim['ow'],
+            self._sim['trueE'],
+            np.asarray(self._sin_dec_bins, dtype=np.float64),
+            np.asarray(self._log_energy_bins, dtype=np.float64),
+            np.asarray(gamma_bins, dtype=np.float64),
+        ]:
+            array = np.ascontiguousarray(array)
+            digest.update(f'{array.dtype.str}{array.shape}'.encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    def _build_dec_bands(
+        self,
+        dec_bands: np.ndarray,
+        verbose: bool = False,
+    ) -> None:
+        """Builds the log(sob) table of some sin(dec) bands.
 
-        self._log_sob_gamma_splines = self._init_log_sob_gamma_splines(
-            gamma_bins, verbose=verbose)
+        Args:
+            dec_bands: The indices of the sin(dec) bands to build.
+            verbose: A flag to print progress.
+        """
+        breaks, coeffs = self._pack_splines(self._init_log_sob_gamma_splines(
+            self._gamma_bins, verbose=verbose, dec_bands=dec_bands))
+
+        if self._log_sob_gamma_coeffs is None:
+            self._log_sob_gamma_breaks = breaks
+            n_bins = self._built_dec_bands.size * (
+                len(self._log_energy_bins) - 1)
+            self._log_sob_gamma_coeffs = np.full(
+                (*coeffs.shape[:2], n_bins), np.nan)
+
+        table = self._log_sob_gamma_coeffs.reshape(
+            *coeffs.shape[:2], self._built_dec_bands.size, -1)
+        table[:, :, dec_bands] = coeffs.reshape(
+            *coeffs.shape[:2], len(dec_bands), -1)
+        self._built_dec_bands[dec_bands] = True
 
     def _init_sob_map(self, gamma: float, *args, verbose: bool = False,
                       **kwargs) -> np.array:
         """Creates sob histogram for a given spectral index (gamma).
 
+        See _init_sob_maps().
+
+        Args:
+            gamma: The gamma value to use to weight the signal.
+            verbose: A flag to print progress.
+
+        Returns:
+            An array of signal-over-background values binned in sin(dec) and
+            log(energy) for a given gamma.
+        """
+        return self._init_sob_maps(
+            np.array([gamma]), *args, verbose=verbose, **kwargs)[0]
+
+    def _init_sob_maps(self, gamma_bins: np.array, *args,
+                       verbose: bool = False,
+                       chunk_size: int = 2**24,
+                       dec_bands: Optional[np.ndarray] = None,
+                       **kwargs) -> np.array:
+        """Creates sob histograms for several spectral indices (gammas).
+
+        The background histogram and the bin of each sim event are found only
+        once. The signal histograms of all gammas are then filled by a single
+        bincount over a (gammas, sim events) weight matrix, which is split
+        into blocks of at most chunk_size elements to bound memory use.
+
         The UnivariateSpline function call uses these default arguments:
         k=1, s=0, ext=3. To replace any of these defaults, or to pass any other
         args/kwargs to UnivariateSpline, just pass them to this function.
@@ -113,34 +254,51 @@ class I3EventModel(
         each bin.
 
         Args:
-            gamma: The gamma value to use to weight the signal.
+            gamma_bins: The gamma values to use to weight the signal.
             verbose: A flag to print progress.
+            chunk_size: The largest number of weights to hold at once.
+            dec_bands: The indices of the sin(dec) bands to make maps for.
+                Defaults to all of them.
 
         Returns:
-            An array of signal-over-background values binned in sin(dec) and
-            log(energy) for a given gamma.
+            An array of signal-over-background values binned in gamma,
+            sin(dec), and log(energy).
         """
-        if verbose:
-            print(f'Building map for gamma = {gamma}...', end='')
-        bins = np.array([self._sin_dec_bins, self._log_energy_bins])
-        bin_centers = bins[1, :-1] + np.diff(bins[1]) / 2
+        gamma_bins = np.atleast_1d(gamma_bins)
+        bin_centers = self._log_energy_bins[:-1] + np.diff(
+            self._log_energy_bins) / 2
+        n_log_energy_bins = len(self._log_energy_bins) - 1
+        n_bins = (len(self._sin_dec_bins) - 1) * n_log_energy_bins
+        if dec_bands is None:
+            dec_bands = np.arange(len(self._sin_dec_bins) - 1)
 
         # background
-        bg_h, _, _ = np.histogram2d(self._data['sindec'], self._data['logE'],
-                                    bins=bins, density=True)
+        bg_h = self._sob_histogram(
+            self._flat_bin_index(self._data)[0], n_bins, 1,
+            dec_bands=dec_bands)[0]
 
         # signal
-        sig_w = self._sim['ow'] * self._sim['trueE']**gamma
-        sig_h, _, _ = np.histogram2d(self._sim['sindec'], self._sim['logE'],
-                                     bins=bins, weights=sig_w, density=True)
-
-        # Normalize histograms by dec band
-        bg_h /= np.sum(bg_h, axis=1)[:, None]
-        sig_h /= np.sum(sig_h, axis=1)[:, None]
+        sim_idx, in_range = self._flat_bin_index(self._sim)
+        in_bands = np.isin(sim_idx // n_log_energy_bins, dec_bands)
+        sim_idx = sim_idx[in_bands]
+        sim_ow = self._sim['ow'][in_range][in_bands]
+        sim_true_e = self._sim['trueE'][in_range][in_bands]
+
+        sig_h = np.empty((len(gamma_bins), *bg_h.shape))
+        n_gammas = max(1, chunk_size // max(1, len(sim_idx)))
+        for i in range(0, len(gamma_bins), n_gammas):
+            gammas = gamma_bins[i:i + n_gammas]
+            if verbose:
+                print(f'Building maps for gamma = {gammas}...', end='')
+            sig_w = sim_ow * sim_true_e**gammas[:, np.newaxis]
+            sig_h[i:i + n_gammas] = self._sob_histogram(
+                sim_idx, n_bins, len(gammas), sig_w, dec_bands=dec_bands)
+            if verbose:
+                print('done')
 
         # div-0 okay here
         with np.errstate(divide='ignore', invalid='ignore'):
-            ratio = sig_h / bg_h
+            ratios = sig_h / bg_h
 
         if 'k' not in kwargs:
             kwargs['k'] = 1
@@ -149,23 +307,99 @@ class I3EventModel(
         if 'ext' not in kwargs:
             kwargs['ext'] = 3
 
-        for i in range(ratio.shape[0]):
-            # Pick out the values we want to use.
-            # We explicitly want to avoid NaNs and infinities
-            good = np.isfinite(ratio[i]) & (ratio[i] > 0)
-            good_bins, good_vals = bin_centers[good], ratio[i][good]
+        for ratio in ratios:
+            for i in range(ratio.shape[0]):
+                # Pick out the values we want to use.
+                # We explicitly want to avoid NaNs and infinities
+                good = np.isfinite(ratio[i]) & (ratio[i] > 0)
+                good_bins, good_vals = bin_centers[good], ratio[i][good]
 
-            # Do a linear interpolation across the energy range
-            spline = Spline(good_bins, good_vals, *args, **kwargs)
+                # Do a linear interpolation across the energy range
+                spline = Spline(good_bins, good_vals, *args, **kwargs)
 
-            # And store the interpolated values
-            ratio[i] = spline(bin_centers)
-        if verbose:
-            print('done')
-        return ratio
+                # And store the interpolated values
+                ratio[i] = spline(bin_centers)
+        return ratios
+
+    def _flat_bin_index(
+        self,
+        events: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds the flat (sin(dec), log(energy)) bin of each event.
+
+        The bins follow np.histogram2d(): the last bin of each axis includes
+        its upper edge, and events outside the bins are left out.
+
+        Args:
+            events: An array of events including their sin(dec) and log(E).
+
+        Returns:
+            The flat bin index of each event in the bins, and a mask of which
+            events are in the bins.
+        """
+        idxs = []
+        in_range = np.ones(len(events), dtype=bool)
+        for edges, values in [
+            (self._sin_dec_bins, events['sindec']),
+            (self._log_energy_bins, events['logE']),
+        ]:
+            idx = np.searchsorted(edges, values, side='right') - 1
+            idx[values == edges[-1]] = len(edges) - 2
+            in_range &= (idx >= 0) & (idx < len(edges) - 1)
+            idxs.append(idx)
+
+        flat_idx = idxs[0] * (len(self._log_energy_bins) - 1) + idxs[1]
+        return flat_idx[in_range], in_range
+
+    def _sob_histogram(
+        self,
+        flat_idx: np.ndarray,
+        n_bins: int,
+        n_hists: int,
+        weights: Optional[np.ndarray] = None,
+        dec_bands: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Fills histograms normalized by dec band from flat bin indices.
+
+        Each histogram is a density, as from np.histogram2d(density=True),
+        divided by its sum in each sin(dec) band.
+
+        Args:
+            flat_idx: The flat bin index of each event in the bins.
+            n_bins: The number of flat bins.
+            n_hists: The number of histograms to fill.
+            weights: The (n_hists, events in the bins) weights, if any.
+            dec_bands: The indices of the sin(dec) bands to return. Defaults
+                to all of them.
+
+        Returns:
+            The (n_hists, dec_bands, log_energy_bins) histograms.
+        """
+        if weights is None:
+            counts = np.bincount(flat_idx, minlength=n_bins)[np.newaxis, :]
+        else:
+            offsets = (np.arange(n_hists) * n_bins)[:, np.newaxis]
+            counts = np.bincount(
+                (flat_idx + offsets).ravel(),
+                weights=weights.ravel(),
+                minlength=n_hists * n_bins,
+            ).reshape(n_hists, n_bins)
+
+        # The bin widths in sin(dec) and the overall normalization of the
+        # densities cancel in the normalization by dec band.
+        hists = counts.reshape(
+            n_hists,
+            len(self._sin_dec_bins) - 1,
+            len(self._log_energy_bins) - 1,
+        )
+        if dec_bands is not None:
+            hists = hists[:, dec_bands]
+        hists = hists / np.diff(self._log_energy_bins)
+        return hists / np.sum(hists, axis=2, keepdims=True)
 
     def _init_log_sob_gamma_splines(self, gamma_bins: np.array, *args,
                                     verbose: bool = False,
+                                    dec_bands: Optional[np.ndarray] = None,
                                     **kwargs) -> List[List[Spline]]:
         """Builds a 3D hist of sob vs. sin(dec), log(energy), and gamma, then
             returns splines of sob vs. gamma.
@@ -179,13 +413,15 @@ class I3EventModel(
         Args:
             gamma_bins: The spectral indicies at which to build the histograms.
             verbose: A flag to print progress.
+            dec_bands: The indices of the sin(dec) bands to fit splines for.
+                Defaults to all of them.
 
-        Returns: A Nested spline list of shape (sin_dec_bins, log_energy_bins).
+        Returns: A Nested spline list of shape (dec_bands, log_energy_bins).
         """
         if verbose:
             print('Building signal-over-background maps...')
-        sob_maps = np.array([self._init_sob_map(gamma, verbose=verbose)
-                             for gamma in gamma_bins])
+        sob_maps = self._init_sob_maps(
+            gamma_bins, verbose=verbose, dec_bands=dec_bands)
         if verbose:
             print('done.')
 
@@ -212,11 +448,56 @@ class I3EventModel(
 
         return splines
 
+    @staticmethod
+    def _pack_splines(
+        splines: List[List[Spline]],
+    ) -> Tuple[np.array, np.array]:
+        """Packs a 2D list of splines into one piecewise polynomial table.
+
+        Args:
+            splines: Splines of shape (sin_dec_bins, log_energy_bins), which
+                must all share the same knots.
+
+        Returns:
+            The breakpoints and coefficients of the table (see
+            log_sob_gamma_breaks and log_sob_gamma_coeffs).
+
+        Raises:
+            ValueError: If the splines have different knots.
+        """
+        flat_splines = [spline for dec_bin in splines for spline in dec_bin]
+        knots = flat_splines[0].get_knots()
+
+        coeffs = []
+        for spline in flat_splines:
+            if not np.array_equal(spline.get_knots(), knots):
+                raise ValueError('The splines must all share the same knots.')
+            ppoly = scipy.interpolate.PPoly.from_spline(
+                spline._eval_args)  # pylint: disable=protected-access
+            coeffs.append(ppoly.c)
+
+        # Only keep the intervals between distinct breakpoints
+        keep = np.diff(ppoly.x) > 0
+        return (
+            np.append(ppoly.x[:-1][keep], ppoly.x[-1]),
+            np.ascontiguousarray(
+                np.array(coeffs)[:, :, keep].transpose(2, 1, 0)),
+        )
+
     def log_sob_spline_prepro(
         self,
         events: np.ndarray,
-    ) -> Tuple[np.ndarray, List]:
-        """Docstring"""
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds the energy and sin(dec) bin of each event.
+
+        Args:
+            events: An array of events including their sin(dec) and log(E).
+
+        Returns:
+            The index of each event into the second array, which holds the
+            unique flat bin indices into the log(sob) table. The table of
+            every sin(dec) band they are in is built if it was not yet.
+        """
         # Get the bin that each event belongs to
         sin_dec_idx = np.searchsorted(self._sin_dec_bins[:-1],
                                       events['sindec'])
@@ -224,25 +505,104 @@ class I3EventModel(
         log_energy_idx = np.searchsorted(self._log_energy_bins[:-1],
                                          events['logE'])
 
-        spline_idxs, event_spline_idxs = np.unique(
-            [sin_dec_idx - 1, log_energy_idx - 1],
-            return_inverse=True,
-            axis=1
-        )
+        # Events below the first bin edge wrap around to the last bin, as
+        # indexing the old nested list of splines with -1 did.
+        n_sin_dec_bins = len(self._sin_dec_bins) - 1
+        n_log_energy_bins = len(self._log_energy_bins) - 1
+        bin_idxs = (sin_dec_idx - 1) % n_sin_dec_bins * n_log_energy_bins
+        bin_idxs += (log_energy_idx - 1) % n_log_energy_bins
+
+        table_idxs, event_table_idxs = np.unique(
+            bin_idxs, return_inverse=True)
 
-        splines = [
-            self._log_sob_gamma_splines[i][j]
-            for i, j in spline_idxs.T
-        ]
+        dec_bands = np.unique(table_idxs // n_log_energy_bins)
+        missing = dec_bands[~self._built_dec_bands[dec_bands]]
+        if len(missing) > 0:
+            self._build_dec_bands(missing)
 
-        return np.array(event_spline_idxs, dtype=int), splines
+        return np.array(event_table_idxs, dtype=int).reshape((-1,)), table_idxs
+
+    def _log_sob_table(
+        self,
+        gamma: float,
+        table_idxs: np.ndarray,
+        derivative: bool = False,
+    ) -> Union[np.array, Tuple[np.array, np.array]]:
+        """Evaluates the log(sob) table at gamma for some of its bins.
+
+        Args:
+            gamma: The spectral index.
+            table_idxs: The flat bin indices to evaluate.
+            derivative: If True, also return d(log(sob))/d(gamma).
+
+        Returns:
+            The log(sob) of each bin, and its derivative if asked for.
+
+        Raises:
+            ValueError: If gamma is outside of the gamma bins of the table.
+        """
+        gamma = float(np.reshape(gamma, (-1,))[0])
+        breaks = self._log_sob_gamma_breaks
+        if not breaks[0] <= gamma <= breaks[-1]:
+            raise ValueError(
+                f'gamma = {gamma} is outside of the range of the energy '
+                f'sob table, [{breaks[0]}, {breaks[-1]}].'
+            )
+
+        interval = min(np.searchsorted(breaks, gamma, side='right') - 1,
+                       len(breaks) - 2)
+        coeffs = self._log_sob_gamma_coeffs[interval][:, table_idxs]
+        delta = gamma - breaks[interval]
+
+        # Horner's method, for the value and the derivative together
+        value = coeffs[0]
+        deriv = np.zeros_like(value)
+        for coeff in coeffs[1:]:
+            deriv = deriv * delta + value
+            value = value * delta + coeff
+
+        if derivative:
+            return value, deriv
+        return value
 
     def get_sob_energy(
         self,
         gamma: float,
-        splines: List[Spline],
-        event_spline_idxs: np.ndarray,
+        table_idxs: np.ndarray,
+        event_table_idxs: np.ndarray,
+        dtype: type = np.float64,
     ) -> np.array:
         """Docstring"""
-        spline_evals = np.exp([spline(gamma) for spline in splines])
-        return spline_evals[event_spline_idxs]
+        sob = np.exp(self._log_sob_table(gamma, table_idxs))
+        return sob.astype(dtype, copy=False)[event_table_idxs]
+
+    def get_log_sob_energy(
+        self,
+        gamma: float,
+        table_idxs: np.ndarray,
+        event_table_idxs: np.ndarray,
+        dtype: type = np.float64,
+    ) -> np.array:
+        """Evaluates the log(sob) table at gamma, without exponentiating."""
+        log_sob = self._log_sob_table(gamma, table_idxs)
+        return log_sob.astype(dtype, copy=False)[event_table_idxs]
+
+    def get_sob_energy_gradient(
+        self,
+        gamma: float,
+        table_idxs: np.ndarray,
+        event_table_idxs: np.ndarray,
+    ) -> np.array:
+        """Gets the derivative of the energy sob with respect to gamma.
+
+        Args:
+            gamma: The spectral index.
+            table_idxs: The flat bin indices into the log(sob) table.
+            event_table_idxs: The index into table_idxs for each event.
+
+        Returns:
+            d(sob)/d(gamma) for each event.
+        """
+        log_sob, dlog_sob = self._log_sob_table(
+            gamma, table_idxs, derivative=True)
+        return (np.exp(log_sob) * dlog_sob)[event_table_idxs]
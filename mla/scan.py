@@ -0,0 +1,367 @@
+"""
+An all-sky scan, fitting a point source at every position of a sky grid. The
+source-independent parts of the test-statistic are preprocessed once per
+trial and shared between the positions.
+"""
+
+__author__ = 'John Evans'
+__copyright__ = 'Copyright 2020 John Evans'
+__credits__ = ['John Evans', 'Jason Fan', 'Michael Larson']
+__license__ = 'Apache License 2.0'
+__version__ = '0.0.1'
+__maintainer__ = 'John Evans'
+__email__ = 'john.evans@icecube.wisc.edu'
+__status__ = 'Development'
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import concurrent.futures
+import copy
+import itertools
+import os
+import numpy as np
+
+from dataclasses import dataclass
+from dataclasses import field
+
+from . import analysis as mla_analysis
+from . import sources
+from . import test_statistics
+from . import _models
+
+
+@dataclass(frozen=True)
+class SkyScanResult:
+    """The result of a scan_sky() scan.
+
+    Attributes:
+        skymap (np.ndarray): One row per grid position, in the order of the
+            grid, with its ra, dec, and best-fit ts, ns, and fit parameters.
+        hottest (np.ndarray): The row of skymap with the largest ts.
+    """
+    skymap: np.ndarray
+    hottest: np.ndarray
+
+
+@dataclass
+class _PixelSpatialTerm(test_statistics.SoBTerm):
+    """A spatial term that was computed by the scan for one position.
+
+    The scan makes it already preprocessed for the events it selected. If it
+    is preprocessed again, a copy of the spatial term it was computed from
+    does the work.
+    """
+    spatial_term: test_statistics.SpatialTerm
+    sob_spatial: np.ndarray
+
+    def preprocess(
+        self,
+        params: np.ndarray,
+        bounds: test_statistics.Bounds,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> Tuple[np.ndarray, test_statistics.Bounds]:
+        """Recomputes the spatial term with a copy of its SpatialTerm."""
+        spatial_term = copy.copy(self.spatial_term)
+        spatial_term.dtype = self.dtype
+        drop_index, bounds = spatial_term.preprocess(
+            params, bounds, events, event_model, source)
+        self.sob_spatial = spatial_term(params, events)
+        return drop_index, bounds
+
+    @property
+    def param_names(self) -> Optional[Sequence[str]]:
+        """The term does not depend on any parameters."""
+        return []
+
+    def drop_events(self, drop_index: np.ndarray) -> None:
+        """Keeps only some of the events."""
+        self.sob_spatial = self.sob_spatial[drop_index]
+
+    def __call__(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Gets the spatial signal-over-background of the events."""
+        return self.sob_spatial.astype(self.dtype, copy=False)
+
+    def sob_batch(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Gets the values, which are the same for every parameter set."""
+        return self(params[0], events)[np.newaxis, :]
+
+    def gradient(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Gets the (empty) derivatives of a term without parameters."""
+        del params, events  # Unused.
+        return {}
+
+    @property
+    def has_gradient(self) -> bool:
+        """The empty gradient is exact."""
+        return True
+
+
+@dataclass
+class _ScanContext:
+    """The per-trial state shared by every position of a scan."""
+    analysis: mla_analysis.Analysis
+    test_statistic: test_statistics.LLHTestStatistic
+    spatial_term: test_statistics.SpatialTerm
+    cut_sigma: float
+    _events: np.ndarray = field(init=False, repr=False)
+    _bg_pdf: np.ndarray = field(init=False, repr=False)
+    _index: test_statistics.DecBandIndex = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Docstring"""
+        self._events = self.test_statistic.events
+        self._bg_pdf = self.analysis.model.background_spatial_pdf(self._events)
+        self._index = test_statistics.DecBandIndex(self._events)
+
+    def fit(
+        self,
+        ra: float,
+        dec: float,
+        test_params: np.ndarray,
+        **kwargs,
+    ) -> Dict[str, float]:
+        """Fits a point source at one position."""
+        source = sources.Source(name='scan', ra=ra, dec=dec)
+        candidates = self._index.query_band(
+            dec, self.cut_sigma * self._index.max_ang_err)
+        candidate_events = self._events[candidates]
+
+        dist_sq = test_statistics.angular_distance_sq(
+            candidate_events, ra, dec)
+        in_cone = dist_sq <= self.cut_sigma**2 * candidate_events['angErr']**2
+
+        sob_spatial = self.spatial_term.gauassian_spatial_pdf(
+            candidate_events[in_cone], source)
+        sob_spatial /= self._bg_pdf[candidates[in_cone]]
+        nonzero = sob_spatial != 0
+
+        pixel_ts = self.test_statistic.select_events(
+            candidates[in_cone][nonzero],
+            [_PixelSpatialTerm(self.spatial_term, sob_spatial[nonzero])],
+        )
+
+        result = mla_analysis.minimize_ts(
+            self.analysis,
+            None,
+            test_params=test_params,
+            ts=pixel_ts,
+            as_array=True,
+            preprocessed=True,
+            **kwargs,
+        )
+
+        return {name: result[name][0] for name in result.dtype.names}
+
+
+def sky_grid(spacing: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Makes a grid of roughly equally spaced positions over the whole sky.
+
+    The positions lie on rings of constant declination, spacing apart, and
+    each ring has as many positions as fit with about spacing between them.
+
+    Args:
+        spacing: The distance between neighboring positions (radians).
+
+    Returns:
+        The right ascensions and declinations of the positions.
+    """
+    n_rings = int(np.ceil(np.pi / spacing)) + 1
+    ras, decs = [], []
+    for dec in np.linspace(-np.pi / 2, np.pi / 2, n_rings):
+        n_ras = max(1, int(np.round(2 * np.pi * np.cos(dec) / spacing)))
+        ras.append(np.arange(n_ras) * 2 * np.pi / n_ras)
+        decs.append(np.full(n_ras, dec))
+    return np.concatenate(ras), np.concatenate(decs)
+
+
+def scan_sky(
+    analysis: mla_analysis.Analysis,
+    events: np.ndarray,
+    ras: np.ndarray,
+    decs: np.ndarray,
+    test_params: np.ndarray = np.empty(1, dtype=[('empty', int)]),
+    bounds: test_statistics.Bounds = None,
+    cut_sigma: Optional[float] = None,
+    n_jobs: int = 1,
+    warm_start: bool = True,
+    verbose: bool = False,
+    **kwargs,
+) -> SkyScanResult:
+    """Fits a point source at every position of a sky grid.
+
+    The test-statistic of the analysis must have exactly one SpatialTerm. Its
+    other terms do not depend on the source position, so they (and the
+    background spatial pdf) are preprocessed for every event of the trial only
+    once. At each position, only the events within cut_sigma times their
+    angErr of it are fit, and the rest count as dropped, as with
+    SpatialTerm(cut_sigma=cut_sigma).
+
+    The positions are fit ring by ring, where a ring is the positions with
+    the same declination, in order of right ascension. With warm_start, each
+    fit starts from the best fit of the position before it on its ring,
+    which is usually close.
+
+    Args:
+        analysis: The analysis to scan with. Its source is ignored.
+        events: The events of the trial.
+        ras: The right ascensions of the grid positions (radians).
+        decs: The declinations of the grid positions (radians).
+        test_params: The starting parameters of the fits. Only the first row
+            is used.
+        bounds: The bounds of the fit parameters.
+        cut_sigma: The cone cut radius, in units of angErr. Defaults to the
+            cut_sigma of the SpatialTerm, or 5 if it has none.
+        n_jobs: The number of worker processes to use. The preprocessed
+            trial is sent to each worker once. A value of -1 uses all
+            available CPUs.
+        warm_start: If True, start each fit from the previous best fit.
+        verbose: A flag to print progress.
+        **kwargs: Passed on to minimize_ts().
+
+    Returns:
+        The fit at every position and the hottest spot.
+
+    Raises:
+        ValueError: If the test-statistic does not have exactly one
+            SpatialTerm.
+    """
+    ts = copy.deepcopy(analysis.test_statistic)
+    spatial_terms = [
+        term for term in ts.sob_terms
+        if isinstance(term, test_statistics.SpatialTerm)
+    ]
+    if len(spatial_terms) != 1:
+        raise ValueError(
+            'The test-statistic must have exactly one SpatialTerm.')
+
+    spatial_term = spatial_terms[0]
+    ts.sob_terms.remove(spatial_term)
+    if cut_sigma is None:
+        cut_sigma = spatial_term.cut_sigma or 5
+
+    if verbose:
+        print('Preprocessing...', end='', flush=True)
+
+    ts.preprocess(
+        test_params[0],
+        events,
+        analysis.model,
+        analysis.source,
+        bounds=bounds,
+    )
+    context = _ScanContext(analysis, ts, spatial_term, cut_sigma)
+
+    if verbose:
+        print('done')
+
+    ras, decs = np.broadcast_arrays(np.asarray(ras), np.asarray(decs))
+    order = np.lexsort((ras, decs))
+
+    # Warm starts only chain along a ring of constant declination, so the
+    # results do not depend on how the rings are split between workers.
+    rings = [
+        (ras[ring], decs[ring]) for ring in
+        np.split(order, np.flatnonzero(np.diff(decs[order])) + 1)
+    ]
+
+    if n_jobs == 1:
+        results = _fit_rings(context, rings, test_params, warm_start, kwargs)
+    else:
+        if n_jobs < 0:
+            n_jobs = os.cpu_count()
+
+        tasks = [
+            [rings[i] for i in idxs]
+            for idxs in np.array_split(
+                np.arange(len(rings)),
+                min(len(rings), 4 * n_jobs),
+            )
+        ]
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_worker,
+            initargs=(context,),
+        ) as executor:
+            results = list(itertools.chain.from_iterable(executor.map(
+                _worker_fit_rings,
+                tasks,
+                itertools.repeat(test_params),
+                itertools.repeat(warm_start),
+                itertools.repeat(kwargs),
+            )))
+
+    names = ['ts', 'ns', *[
+        name for name in test_params.dtype.names if name not in ['ns', 'empty']
+    ]]
+    skymap = np.full(
+        len(order),
+        np.nan,
+        dtype=[(name, np.float64) for name in ['ra', 'dec', *names]],
+    )
+    skymap['ra'] = ras
+    skymap['dec'] = decs
+    for name in names:
+        skymap[name][order] = [result.get(name, np.nan) for result in results]
+
+    return SkyScanResult(
+        skymap=skymap,
+        hottest=skymap[np.nanargmax(skymap['ts'])],
+    )
+
+
+def _fit_rings(
+    context: _ScanContext,
+    rings: List[Tuple[np.ndarray, np.ndarray]],
+    test_params: np.ndarray,
+    warm_start: bool,
+    kwargs: dict,
+) -> List[Dict[str, float]]:
+    """Fits each position of each ring in turn."""
+    results = []
+
+    for ras, decs in rings:
+        params = test_params[:1].copy()
+        for ra, dec in zip(ras, decs):
+            result = context.fit(ra, dec, params, **kwargs)
+            results.append(result)
+
+            if warm_start and result['ts'] > 0:
+                for name in params.dtype.names:
+                    if name in result:
+                        params[name] = result[name]
+
+    return results
+
+
+_WORKER_CONTEXT: Optional[_ScanContext] = None
+
+
+def _init_worker(context: _ScanContext) -> None:
+    """Stores the scan context once per worker process."""
+    global _WORKER_CONTEXT
+    _WORKER_CONTEXT = context
+
+
+def _worker_fit_rings(
+    rings: List[Tuple[np.ndarray, np.ndarray]],
+    test_params: np.ndarray,
+    warm_start: bool,
+    kwargs: dict,
+) -> List[Dict[str, float]]:
+    """Runs _fit_rings() in a worker on the worker's scan context."""
+    return _fit_rings(_WORKER_CONTEXT, rings, test_params, warm_start, kwargs)
@@ -0,0 +1,363 @@
+"""
+Functions to find the signal strength at which a given fraction of trials pass
+a background test-statistic threshold, e.g. sensitivities and discovery
+potentials.
+"""
+
+__author__ = 'John Evans'
+__copyright__ = 'Copyright 2020 John Evans'
+__credits__ = ['John Evans', 'Jason Fan', 'Michael Larson']
+__license__ = 'Apache License 2.0'
+__version__ = '0.0.1'
+__maintainer__ = 'John Evans'
+__email__ = 'john.evans@icecube.wisc.edu'
+__status__ = 'Development'
+
+from typing import Dict, List, Optional, Tuple, Union
+
+import copy
+import numpy as np
+import scipy.stats
+
+from dataclasses import dataclass
+
+from . import analysis as mla_analysis
+from . import test_statistics
+from . import ts_distribution
+
+
+@dataclass(frozen=True)
+class SignalStrengthResult:
+    """The result of a find_signal_strength() search.
+
+    Attributes:
+        signal_strength (float): The flux_norm (or mean number of signal
+            events, if by_n_signal) at which passing_fraction of trials pass.
+        signal_strength_error (float): The statistical uncertainty on
+            signal_strength from the finite number of trials.
+        ts_threshold (float): The test-statistic threshold trials must exceed.
+        passing_fraction (float): The target fraction of passing trials.
+        by_n_signal (bool): Whether signal_strength is a mean number of
+            signal events instead of a flux_norm.
+        n_trials (int): The total number of signal trials used.
+        points (np.ndarray): The signal strengths tried, with the number of
+            trials and passing trials at each.
+    """
+    signal_strength: float
+    signal_strength_error: float
+    ts_threshold: float
+    passing_fraction: float
+    by_n_signal: bool
+    n_trials: int
+    points: np.ndarray
+
+
+def find_signal_strength(
+    analysis: mla_analysis.Analysis,
+    ts_threshold: float,
+    passing_fraction: float = 0.9,
+    signal_range: Tuple[float, float] = (0, 1),
+    by_n_signal: bool = False,
+    n_background: int = 1000,
+    trials_per_step: int = 100,
+    max_trials_per_point: int = 6400,
+    rtol: float = 0.01,
+    confidence_sigma: float = 2,
+    max_iterations: int = 50,
+    cache_background: bool = True,
+    random_seed: Optional[int] = None,
+    rng: Optional[np.random.Generator] = None,
+    verbose: bool = False,
+    **kwargs,
+) -> SignalStrengthResult:
+    """Finds the signal strength at which a fraction of trials pass a threshold.
+
+    The search is a stochastic bisection. Each new signal strength is
+    interpolated from the bracketing points, and trials are added there in
+    doubling batches only until the Wilson score interval on its passing
+    fraction excludes the target (which then narrows the bracket) or the
+    point reaches max_trials_per_point (so it is consistent with the
+    target). The result is the root of a weighted straight-line fit of the
+    passing fraction over the final bracket.
+
+    A pool of n_background background-only trials is produced up front. The
+    k-th trial at every signal strength adds freshly injected signal events
+    to the k-th pool trial, so the background fluctuations are shared between
+    points and largely cancel in the comparisons between them. With
+    cache_background, each pool trial is also preprocessed only once, and
+    each signal trial only preprocesses its new signal events.
+
+    A pool trial is never used twice at the same signal strength, since the
+    Wilson intervals treat every trial at a point as independent. If a point
+    needs more trials than the pool holds, the pool is grown by another
+    n_background trials.
+
+    Args:
+        analysis: The analysis to produce and minimize trials for.
+        ts_threshold: Trials pass if their test-statistic is above this.
+        passing_fraction: The target fraction of passing trials, e.g. 0.9 for
+            a sensitivity or 0.5 for a discovery potential.
+        signal_range: The initial bracket of signal strengths. The upper end
+            is doubled until it brackets the target.
+        by_n_signal: If True, the signal strength is the mean number of
+            injected signal events instead of a flux_norm.
+        n_background: The number of background-only trials to add to the
+            pool at a time.
+        trials_per_step: The size of the first batch of trials at each point.
+        max_trials_per_point: The most trials to run at one signal strength.
+        rtol: Stop when the bracket is narrower than this fraction of its
+            upper end.
+        confidence_sigma: The width (in sigma) of the Wilson intervals used to
+            compare points to the target.
+        max_iterations: The most bisection steps (including bracket
+            doublings) to take.
+        cache_background: If True, keep the preprocessed test-statistic of
+            every pool trial that has been used. This needs memory for a
+            preprocessed trial per pool trial (up to max_trials_per_point),
+            and every term of the test-statistic must support
+            append_events().
+        random_seed: A seed value for the numpy RNG. Ignored if rng is given.
+        rng: The random number generator to produce the trials with.
+        verbose: A flag to print progress.
+        **kwargs: Passed on to minimize_ts(), e.g. test_params and bounds.
+
+    Returns:
+        The signal strength with its uncertainty and the points tried.
+
+    Raises:
+        ValueError: If the lower end of signal_range already passes, or if the
+            target is not bracketed within max_iterations doublings.
+    """
+    if rng is None:
+        rng = np.random.default_rng(random_seed)
+
+    ts = copy.deepcopy(analysis.test_statistic)
+    pool: List[np.ndarray] = []
+    backgrounds: Dict[int, test_statistics.LLHTestStatistic] = {}
+    points: Dict[float, List[int]] = {}
+
+    def grow_pool() -> None:
+        pool.extend(mla_analysis.iterate_trials(
+            *mla_analysis.produce_trials(analysis, n_background, rng=rng)))
+
+    grow_pool()
+
+    def trial_ts(k: int, strength: float) -> float:
+        while k >= len(pool):
+            grow_pool()
+        background = pool[k]
+        signal = mla_analysis.produce_signal(
+            analysis,
+            0 if by_n_signal else strength,
+            rng.poisson(strength) if by_n_signal else None,
+            dtype=background.dtype,
+            rng=rng,
+        )
+
+        if not cache_background:
+            return mla_analysis.minimize_ts(
+                analysis,
+                np.concatenate([background, signal]),
+                ts=ts,
+                as_array=True,
+                **kwargs,
+            )['ts'].max()
+
+        if k not in backgrounds:
+            backgrounds[k] = _preprocess(analysis, background, **kwargs)
+
+        return mla_analysis.minimize_ts(
+            analysis,
+            None,
+            ts=backgrounds[k].with_events(
+                signal, analysis.model, analysis.source),
+            as_array=True,
+            preprocessed=True,
+            **kwargs,
+        )['ts'].max()
+
+    def run_trials(strength: float, n_trials: int) -> None:
+        n_done, n_passing = points.setdefault(strength, [0, 0])
+        for k in range(n_done, n_done + n_trials):
+            n_passing += trial_ts(k, strength) > ts_threshold
+        points[strength] = [n_done + n_trials, n_passing]
+
+    def compare(strength: float) -> int:
+        """Returns the side of the target the passing fraction is on."""
+        n_trials = trials_per_step
+        while True:
+            run_trials(strength, n_trials - points.get(strength, [0])[0])
+            low, high = _wilson_interval(*points[strength], confidence_sigma)
+
+            if verbose:
+                print(f'signal strength {strength:.4g}: '
+                      f'{points[strength][1]}/{points[strength][0]} passing')
+
+            if low > passing_fraction:
+                return 1
+            if high < passing_fraction:
+                return -1
+            if n_trials >= max_trials_per_point:
+                return 0
+            n_trials = min(2 * n_trials, max_trials_per_point)
+
+    lower, upper = signal_range
+    if compare(lower) >= 0:
+        raise ValueError('The lower end of signal_range already passes.')
+
+    iterations = 0
+    while compare(upper) < 0:
+        iterations += 1
+        if iterations >= max_iterations:
+            raise ValueError('Could not bracket the target passing fraction.')
+        lower, upper = upper, 2 * upper
+
+    while iterations < max_iterations and upper - lower > rtol * upper:
+        iterations += 1
+        p_lower, p_upper = (_laplace(*points[x]) for x in (lower, upper))
+        frac = (passing_fraction - p_lower) / max(p_upper - p_lower, 1e-12)
+        strength = lower + np.clip(frac, 0.1, 0.9) * (upper - lower)
+
+        side = compare(strength)
+        if side < 0:
+            lower = strength
+        elif side > 0:
+            upper = strength
+        else:
+            break
+
+    tried = np.array(
+        [(x, n, k) for x, (n, k) in sorted(points.items())],
+        dtype=[
+            ('signal_strength', np.float64),
+            ('n_trials', np.int64),
+            ('n_passing', np.int64),
+        ],
+    )
+    strengths = tried['signal_strength']
+    in_bracket = tried[(strengths >= lower) & (strengths <= upper)]
+    strength, error = _fit_root(in_bracket, passing_fraction)
+
+    return SignalStrengthResult(
+        signal_strength=strength,
+        signal_strength_error=error,
+        ts_threshold=ts_threshold,
+        passing_fraction=passing_fraction,
+        by_n_signal=by_n_signal,
+        n_trials=int(tried['n_trials'].sum()),
+        points=tried,
+    )
+
+
+def sensitivity(
+    analysis: mla_analysis.Analysis,
+    background_ts: Union[np.ndarray, ts_distribution.TSAccumulator],
+    **kwargs,
+) -> SignalStrengthResult:
+    """Finds the signal strength where 90% of trials beat the median background.
+
+    Args:
+        analysis: The analysis to produce and minimize trials for.
+        background_ts: The background test-statistic distribution.
+        **kwargs: Passed on to find_signal_strength().
+    """
+    return find_signal_strength(
+        analysis,
+        _quantile(background_ts, 0.5),
+        **{'passing_fraction': 0.9, **kwargs},
+    )
+
+
+def discovery_potential(
+    analysis: mla_analysis.Analysis,
+    background_ts: Union[np.ndarray, ts_distribution.TSAccumulator],
+    n_sigma: float = 5,
+    **kwargs,
+) -> SignalStrengthResult:
+    """Finds the signal strength where 50% of trials reach n_sigma.
+
+    Args:
+        analysis: The analysis to produce and minimize trials for.
+        background_ts: The background test-statistic distribution. It must
+            have enough trials to resolve the one-sided n_sigma quantile.
+        n_sigma: The significance of the threshold.
+        **kwargs: Passed on to find_signal_strength().
+    """
+    return find_signal_strength(
+        analysis,
+        _quantile(background_ts, scipy.stats.norm.cdf(n_sigma)),
+        **{'passing_fraction': 0.5, **kwargs},
+    )
+
+
+def _quantile(
+    background_ts: Union[np.ndarray, ts_distribution.TSAccumulator],
+    q: float,
+) -> float:
+    """Docstring"""
+    if isinstance(background_ts, ts_distribution.TSAccumulator):
+        return background_ts.quantile(q)
+    return np.quantile(background_ts, q)
+
+
+def _preprocess(
+    analysis: mla_analysis.Analysis,
+    events: np.ndarray,
+    test_params: np.ndarray = np.empty(1, dtype=[('empty', int)]),
+    bounds: test_statistics.Bounds = None,
+    **kwargs,
+) -> test_statistics.LLHTestStatistic:
+    """Preprocesses a background trial as minimize_ts() would."""
+    # kwargs no-op
+    len(kwargs)
+
+    ts = copy.deepcopy(analysis.test_statistic)
+    ts.preprocess(
+        test_params[0],
+        events,
+        analysis.model,
+        analysis.source,
+        bounds=bounds,
+    )
+    return ts
+
+
+def _wilson_interval(
+    n_trials: int,
+    n_passing: int,
+    n_sigma: float,
+) -> Tuple[float, float]:
+    """The Wilson score interval on a binomial passing fraction."""
+    p = n_passing / n_trials
+    z2 = n_sigma**2
+    center = (p + z2 / (2 * n_trials)) / (1 + z2 / n_trials)
+    half_width = n_sigma * np.sqrt(
+        p * (1 - p) / n_trials + z2 / (4 * n_trials**2)) / (1 + z2 / n_trials)
+    return center - half_width, center + half_width
+
+
+def _laplace(n_trials: int, n_passing: int) -> float:
+    """A passing fraction estimate that is never exactly 0 or 1."""
+    return (n_passing + 1) / (n_trials + 2)
+
+
+def _fit_root(
+    points: np.ndarray,
+    passing_fraction: float,
+) -> Tuple[float, float]:
+    """Fits a line to the passing fractions and solves for the target.
+
+    Each point is weighted by its inverse binomial variance, and the
+    uncertainty on the root is propagated from the fit covariance.
+    """
+    x = points['signal_strength']
+    p = _laplace(points['n_trials'], points['n_passing'])
+    weights = points['n_trials'] / (p * (1 - p))
+
+    design = np.stack([np.ones_like(x), x], axis=1)
+    cov = np.linalg.inv(design.T @ (weights[:, None] * design))
+    intercept, slope = cov @ design.T @ (weights * p)
+
+    root = (passing_fraction - intercept) / slope
+    var = (cov[0, 0] + 2 * root * cov[0, 1] + root**2 * cov[1, 1]) / slope**2
+    return root, np.sqrt(var)
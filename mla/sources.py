@@ -12,6 +12,8 @@ __email__ = 'john.evans@icecube.wisc.edu'
 __status__ = 'Development'
 
 
+from typing import Optional
+
 import dataclasses
 
 import numpy as np
@@ -24,12 +26,16 @@ class Source:
     ra: float
     dec: float
 
-    def sample_location(self, size: int):
+    def sample_location(self, size: int,
+                        rng: Optional[np.random.Generator] = None):
         """Sample locations.
 
         Args:
             size: number of points to sample
+            rng: The random number generator to sample with (unused for a
+                point source).
         """
+        del rng  # a point source is not randomly sampled
         return (np.ones(size) * self.ra, np.ones(size) * self.dec)
 
     def get_location(self):
@@ -46,14 +52,18 @@ class GaussianExtendedSource(Source):
     """Gaussian Extended Source"""
     sigma: float
 
-    def sample_location(self, size: int):
+    def sample_location(self, size: int,
+                        rng: Optional[np.random.Generator] = None):
         """Sample locations.
 
         Args:
             size: number of points to sample
+            rng: The random number generator to sample with.
         """
-        return (np.random.normal(self.ra, self.sigma, size),
-                np.random.normal(self.dec, self.sigma, size))
+        if rng is None:
+            rng = np.random.default_rng()
+        return (rng.normal(self.ra, self.sigma, size),
+                rng.normal(self.dec, self.sigma, size))
 
     def get_sigma(self):
         """return sigma for GaussianExtendedSource"""
@@ -9,12 +9,16 @@ __maintainer__ = 'John Evans'
 __email__ = 'john.evans@icecube.wisc.edu'
 __status__ = 'Development'
 
-from typing import Callable, List, Optional, Sequence, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import abc
+import collections
+import concurrent.futures
+import copy
 import dataclasses
 import warnings
 import numpy as np
+import scipy.sparse
 
 from . import sources
 from . import _models
@@ -51,10 +55,66 @@ def angular_distance(src_ra: float, src_dec: float, r_a: float,
     return np.arccos(cos_dist)
 
 
+# Below this squared chord length, psi**2 = chord**2 * (1 + chord**2 / 12) is
+# accurate to about chord**4 / 90 ~ 1e-10 relative.
+_SMALL_ANGLE_CHORD_SQ = 1e-4
+
+
+def angular_distance_sq(events: np.ndarray, src_ra: float,
+                        src_dec: float) -> np.ndarray:
+    """Computes the squared angular distance between events and a point.
+
+    If the events have the x, y, z unit vector fields added by the event
+    models, the distance is found from the chord between the unit vectors,
+    with a small-angle series where it is accurate and 2 * arcsin(chord / 2)
+    elsewhere. Otherwise, this falls back on angular_distance().
+
+    Args:
+        events: An array of events including their ra and dec.
+        src_ra: The right ascension of the point (radians).
+        src_dec: The declination of the point (radians).
+
+    Returns:
+        The squared distance, in radians**2, of each event from the point.
+    """
+    if 'x' not in events.dtype.names:
+        return angular_distance(events['ra'], events['dec'], src_ra,
+                                src_dec)**2
+
+    src_x, src_y, src_z = _models.unit_vector(src_ra, src_dec)
+    chord_sq = (events['x'] - src_x)**2
+    chord_sq += (events['y'] - src_y)**2
+    chord_sq += (events['z'] - src_z)**2
+
+    dist_sq = chord_sq * (1 + chord_sq / 12)
+    large = chord_sq > _SMALL_ANGLE_CHORD_SQ
+    dist_sq[large] = (
+        2 * np.arcsin(np.minimum(np.sqrt(chord_sq[large]) / 2, 1)))**2
+    return dist_sq
+
+
+def _n_selected(index: np.ndarray) -> int:
+    """Counts the events selected by a boolean array or an array of indices."""
+    return index.sum() if index.dtype == bool else len(index)
+
+
 @dataclasses.dataclass
 class LLHTestStatistic:
-    """Docstring"""
+    """Docstring
+
+    Attributes:
+        sob_terms: The signal-over-background terms to multiply.
+        term_cache_size: If given, the cache_size to set on every term.
+        log_space: If True, combine the terms by adding their log_sob()
+            instead of multiplying them.
+        dtype: The floating point type of the per-event term arrays and sob
+            values. With np.float32, the sums over events are still
+            accumulated in np.float64.
+    """
     sob_terms: dataclasses.InitVar[List['SoBTerm']]
+    term_cache_size: dataclasses.InitVar[Optional[int]] = None
+    log_space: dataclasses.InitVar[bool] = False
+    dtype: dataclasses.InitVar[type] = np.float64
 
     _sob_terms: List['SoBTerm'] = dataclasses.field(init=False)
     _n_events: int = dataclasses.field(init=False)
@@ -66,10 +126,31 @@ class LLHTestStatistic:
     _best_ts: float = dataclasses.field(init=False)
     _best_ns: float = dataclasses.field(init=False)
     _bounds: Bounds = dataclasses.field(init=False)
-
-    def __post_init__(self, sob_terms) -> None:
+    _log_space: bool = dataclasses.field(init=False)
+    _dtype: np.dtype = dataclasses.field(init=False)
+    _const_sob: np.ndarray = dataclasses.field(init=False)
+    _const_log_sob: Optional[np.ndarray] = dataclasses.field(init=False)
+    _varying_terms: List['SoBTerm'] = dataclasses.field(init=False)
+    _split_names: Optional[Tuple[str, ...]] = dataclasses.field(init=False)
+
+    def __post_init__(
+        self,
+        sob_terms,
+        term_cache_size,
+        log_space,
+        dtype,
+    ) -> None:
         """Docstring"""
         self._sob_terms = sob_terms
+        self._log_space = log_space
+        self._dtype = np.dtype(dtype)
+
+        for term in self._sob_terms:
+            term.dtype = self._dtype
+
+        if term_cache_size is not None:
+            for term in self._sob_terms:
+                term.cache_size = term_cache_size
 
     def preprocess(
         self,
@@ -80,19 +161,34 @@ class LLHTestStatistic:
         bounds: Bounds = None,
     ) -> None:
         """Docstring"""
+        # Once a term has dropped events, the terms after it only preprocess
+        # the events that are still kept, so a term that keeps few events
+        # (e.g. a SpatialTerm with a cone cut) saves the others the work.
         self._drop_index = np.ones(len(events), dtype=bool)
+        term_kept = []
         for term in self._sob_terms:
+            kept = None
+            if not self._drop_index.all():
+                kept = np.flatnonzero(self._drop_index)
+
             drop_index, bounds = term.preprocess(
                 params,
                 bounds,
-                events,
+                events if kept is None else events[kept],
                 event_model,
                 source,
             )
-            self._drop_index = np.logical_and(self._drop_index, drop_index)
 
-        for term in self._sob_terms:
-            term.drop_events(self._drop_index)
+            if kept is None:
+                self._drop_index = np.logical_and(self._drop_index, drop_index)
+            else:
+                self._drop_index[kept[~drop_index]] = False
+            term_kept.append(kept)
+
+        for term, kept in zip(self._sob_terms, term_kept):
+            term.drop_events(
+                self._drop_index if kept is None else self._drop_index[kept])
+            term.clear_cache()
 
         self._n_events = len(events)
         self._n_kept = self._drop_index.sum()
@@ -101,15 +197,206 @@ class LLHTestStatistic:
         self._n_dropped = self._n_events - self._n_kept
         self._bounds = bounds
         self._params = params
+        self._split_terms(params)
+        self.best_reset()
+
+    def append_events(
+        self,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> None:
+        """Preprocesses new events and adds them to the preprocessed events.
+
+        Only the new events are run through the terms, so adding a few signal
+        events to a preprocessed background trial does not redo the work for
+        the background events.
+
+        Args:
+            events: The new events, with the same dtype as the preprocessed
+                events.
+            event_model: The event model used to preprocess.
+            source: The source used to preprocess.
+
+        Raises:
+            ValueError: If any term does not support appending events.
+        """
+        unsupported = [
+            type(term).__name__ for term in self._sob_terms
+            if not term.supports_append
+        ]
+        if unsupported:
+            raise ValueError(
+                f'Cannot append events to {", ".join(unsupported)}.')
+
+        n_kept = self._n_kept
+        keep_index = np.ones(len(events), dtype=bool)
+        for term in self._sob_terms:
+            keep_index = np.logical_and(
+                keep_index,
+                term.append_events(events, event_model, source),
+            )
+
+        if not keep_index.all():
+            drop_index = np.concatenate(
+                [np.ones(n_kept, dtype=bool), keep_index])
+            for term in self._sob_terms:
+                term.drop_events(drop_index)
+
+        for term in self._sob_terms:
+            term.clear_cache()
+
+        self._n_events += len(events)
+        self._n_kept += keep_index.sum()
+        self._events = np.concatenate([self._events, events[keep_index]])
+        self._n_dropped = self._n_events - self._n_kept
+        self._split_terms(self._params)
         self.best_reset()
 
+    def with_events(
+        self,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> 'LLHTestStatistic':
+        """Returns a copy of this test-statistic with new events appended.
+
+        The terms never modify their preprocessed arrays in place, so the copy
+        shares them with this test-statistic, which is left unchanged. A
+        preprocessed background trial can then be reused for many signal
+        injections.
+
+        Args:
+            events: The new events, with the same dtype as the preprocessed
+                events.
+            event_model: The event model used to preprocess.
+            source: The source used to preprocess.
+
+        Returns:
+            A preprocessed test-statistic for the combined events.
+
+        Raises:
+            ValueError: If any term does not support appending events.
+        """
+        new = self._copy(
+            [copy.copy(term) for term in self._sob_terms], self._events)
+        new.append_events(events, event_model, source)
+        return new
+
+    def select_events(
+        self,
+        index: np.ndarray,
+        sob_terms: Sequence['SoBTerm'] = (),
+    ) -> 'LLHTestStatistic':
+        """Returns a copy of this test-statistic with fewer kept events.
+
+        The events that are not selected count as dropped in the copy. Like
+        with_events(), the copy shares the preprocessed arrays of this
+        test-statistic, which is left unchanged. This lets source-independent
+        terms be preprocessed once and then used for many sources, e.g. in an
+        all-sky scan. Only the selected events are touched, so selecting a
+        few events of a large trial is cheap.
+
+        Args:
+            index: The indices (in increasing order) of the kept events to
+                keep in the copy, or a boolean array over the kept events.
+            sob_terms: More terms, already preprocessed for the selected
+                events, to include in the copy.
+
+        Returns:
+            A preprocessed test-statistic for the selected events.
+        """
+        terms = [copy.copy(term) for term in self._sob_terms]
+        for term in terms:
+            term.drop_events(index)
+            term.clear_cache()
+
+        for term in sob_terms:
+            term.dtype = self._dtype
+            terms.append(term)
+
+        new = self._copy(terms, self._events[index])
+        new.update(self._params)
+        return new
+
+    def _copy(
+        self,
+        sob_terms: List['SoBTerm'],
+        events: np.ndarray,
+    ) -> 'LLHTestStatistic':
+        """Returns a copy of this test-statistic with other preprocessed terms
+        and kept events.
+
+        Everything else is shared with this test-statistic. The constant terms
+        of the copy are multiplied out again on its next update() or
+        append_events(), and until then every term is evaluated.
+        """
+        # pylint: disable=protected-access
+        new = copy.copy(self)
+        new._sob_terms = sob_terms
+        new._events = events
+        new._n_kept = len(events)
+        new._n_dropped = self._n_events - new._n_kept
+        new._split_names = None
+        new.best_reset()
+        return new
+
     def update(self, params: np.ndarray) -> None:
         """Docstring"""
         for term in self._sob_terms:
             term.update(params)
         self._params = params
+
+        if params.dtype.names != self._split_names:
+            self._split_terms(params)
         self.best_reset()
 
+    def _split_terms(self, params: np.ndarray) -> None:
+        """Multiplies out the terms that do not depend on any of params.
+
+        A term is constant if it declares its param_names and none of them
+        are in params. The product (and, in log space, the sum of the logs)
+        of the constant terms is then computed once here instead of on every
+        evaluation.
+        """
+        names = set(params.dtype.names)
+        self._const_sob = np.ones(self._n_kept, dtype=self._dtype)
+        self._const_log_sob = None
+        if self._log_space:
+            self._const_log_sob = np.zeros(self._n_kept, dtype=self._dtype)
+        self._varying_terms = []
+
+        for term in self._sob_terms:
+            if term.param_names is None or names.intersection(term.param_names):
+                self._varying_terms.append(term)
+                continue
+
+            self._const_sob *= term(params, self._events).reshape((-1,))
+            if self._log_space:
+                self._const_log_sob += term.log_sob(
+                    params, self._events).reshape((-1,))
+
+        self._split_names = params.dtype.names
+
+    def _factors(
+        self,
+        params: np.ndarray,
+    ) -> Tuple[np.ndarray, Optional[np.ndarray], List['SoBTerm']]:
+        """Gets the constant sob product and log sob sum, and the terms left
+        to evaluate.
+        """
+        if params.dtype.names == self._split_names:
+            return self._const_sob, self._const_log_sob, self._varying_terms
+
+        const_log_sob = None
+        if self._log_space:
+            const_log_sob = np.zeros(self._n_kept, dtype=self._dtype)
+        return (
+            np.ones(self._n_kept, dtype=self._dtype),
+            const_log_sob,
+            self._sob_terms,
+        )
+
     def best_reset(self) -> None:
         """Docstring"""
         self._best_ns = 0
@@ -131,72 +418,361 @@ class LLHTestStatistic:
         if self._n_events == 0:
             return 0
 
-        sob = self._sob(params)
+        ts, _ = self._ts(self._sob_m1(params), params, **kwargs)
+        return ts
+
+    def value_and_gradient(
+        self,
+        params: np.ndarray,
+        names: List[str],
+        **kwargs,
+    ) -> Tuple[float, Optional[np.ndarray]]:
+        """Evaluates the test-statistic and its gradient.
+
+        The gradient is assembled from each term's analytic gradient(). When
+        n_signal is fit internally, its derivative vanishes at the fit, so only
+        the explicit parameter dependence contributes.
+
+        Args:
+            params: An array containing (*time_params, gamma).
+            names: The parameter names to differentiate with respect to.
+
+        Returns:
+            The test-statistic, and an array of its derivatives with respect to
+            each of names, or None if any term has no analytic gradient.
+        """
+        if self._n_events == 0:
+            return 0, np.zeros(len(names))
+
+        # The constant terms are one factor with no parameter dependence
+        const_sob, const_log_sob, terms = self._factors(params)
+        term_grads = [{}] + [
+            term.gradient(params, self._events) for term in terms]
+
+        if self._log_space:
+            factors = [const_log_sob] + [
+                term.cached_call(params, self._events, log=True).reshape((-1,))
+                for term in terms
+            ]
+            sob_m1 = np.expm1(np.sum(factors, axis=0))
+        else:
+            factors = [const_sob] + [
+                term.cached_call(params, self._events).reshape((-1,))
+                for term in terms
+            ]
+            sob_m1 = np.prod(factors, axis=0) - 1
+
+        ts, ns_ratio = self._ts(sob_m1, params, **kwargs)
+
+        if any(term_grad is None for term_grad in term_grads):
+            return ts, None
 
+        denom = np.abs(ns_ratio) * sob_m1 + 1
+        grad = np.zeros(len(names))
+
+        for i, name in enumerate(names):
+            if name == 'ns':
+                sob_sum = np.sum(sob_m1 / denom, dtype=np.float64)
+                dropped = self._n_dropped / (1 - ns_ratio)
+                grad[i] = -2 / self._n_events * (sob_sum - dropped)
+                continue
+
+            # Product rule over the terms that depend on this parameter
+            dsob = np.zeros(self._n_kept)
+            for j, term_grad in enumerate(term_grads):
+                if name not in term_grad:
+                    continue
+
+                others = factors[:j] + factors[j + 1:]
+                if self._log_space:
+                    others_sob = np.exp(np.sum(others, axis=0))
+                else:
+                    others_sob = np.prod(others, axis=0)
+                dsob += term_grad[name].reshape((-1,)) * others_sob
+
+            grad[i] = -2 * ns_ratio * np.sum(dsob / denom, dtype=np.float64)
+
+        return ts, grad
+
+    def _ts(
+        self,
+        sob_m1: np.ndarray,
+        params: np.ndarray,
+        **kwargs,
+    ) -> Tuple[float, float]:
+        """Calculates the test-statistic and ns ratio and tracks the best fit.
+
+        Args:
+            sob_m1: The sob of each kept event, minus one.
+            params: An array containing (*time_params, gamma).
+        """
         if 'ns' in params.dtype.names:
             ns_ratio = params['ns'] / self._n_events
         else:
-            ns_ratio = self._newton_ns_ratio(sob, **kwargs)
+            ns_ratio = self._newton_ns_ratio(sob_m1, **kwargs)
 
-        llh, drop_term = self._llh(sob, ns_ratio)
-        ts = -2 * (llh.sum() + self._n_dropped * drop_term)
+        llh, drop_term = self._llh(sob_m1, ns_ratio)
+        ts = -2 * (llh.sum(dtype=np.float64) + self._n_dropped * drop_term)
 
         if ts < self._best_ts:
             self._best_ts = ts
             self._best_ns = ns_ratio * self._n_events
 
-        return ts
+        return ts, ns_ratio
 
-    def _sob(self, params: np.ndarray) -> np.ndarray:
-        """Docstring"""
-        sob = np.ones(self._n_kept)
-        for term in self._sob_terms:
-            sob *= term(params, self._events).reshape((-1,))
+    def evaluate(
+        self,
+        params: np.ndarray,
+        **kwargs,
+    ) -> Tuple[float, float]:
+        """Evaluates the test-statistic for one parameter set, statelessly.
+
+        Unlike __call__(), this does not update the terms or change the best
+        fit stored in the test-statistic, so any number of threads can call it
+        on one preprocessed test-statistic at once (see evaluate_batch()).
+
+        Args:
+            params: An array containing (*time_params, gamma).
+
+        Returns:
+            The test-statistic and n_signal.
+        """
+        ts, ns = self.evaluate_batch(np.reshape(params, (1,)), **kwargs)
+        return ts[0], ns[0]
+
+    def evaluate_batch(
+        self,
+        params: np.ndarray,
+        chunk_size: Optional[int] = None,
+        n_threads: int = 1,
+        **kwargs,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Evaluates the test-statistic for many parameter sets at once.
+
+        The signal-over-background matrix of (parameter sets x events) is
+        built from each term's sob_batch() with broadcasting, and n_signal is
+        fit for every row simultaneously, unless it is given in params. Only
+        the non-zero sob values of each row take part in the fit, which makes
+        narrow time windows cheap.
+
+        This only reads the preprocessed arrays: it does not update the terms
+        or change the parameters or best fit stored in the test-statistic. The
+        chunks can then be evaluated by a pool of threads sharing those
+        arrays, as numpy releases the GIL in its large array operations.
+
+        Args:
+            params: A structured array of parameter sets.
+            chunk_size: The number of parameter sets to evaluate at a time.
+                Defaults to a chunk that keeps the sob matrix to about 2**22
+                elements.
+            n_threads: The number of threads to evaluate chunks with.
+
+        Returns:
+            Arrays of the test-statistic and n_signal for each parameter set.
+        """
+        if self._n_events == 0:
+            return np.zeros(len(params)), np.zeros(len(params))
+
+        if chunk_size is None:
+            chunk_size = max(1, 2**22 // max(1, self._n_kept))
+            if n_threads > 1:
+                chunk_size = min(chunk_size, -(-len(params) // n_threads))
+
+        ts = np.empty(len(params))
+        ns_ratio = np.empty(len(params))
+
+        def evaluate_chunk(start: int) -> None:
+            chunk = params[start:start + chunk_size]
+            ts[start:start + chunk_size], ns_ratio[start:start + chunk_size] = (
+                self._evaluate_chunk(chunk, **kwargs))
+
+        starts = range(0, len(params), chunk_size)
+        if n_threads > 1:
+            with concurrent.futures.ThreadPoolExecutor(n_threads) as executor:
+                list(executor.map(evaluate_chunk, starts))
+        else:
+            for start in starts:
+                evaluate_chunk(start)
+
+        return ts, ns_ratio * self._n_events
+
+    def _evaluate_chunk(
+        self,
+        chunk: np.ndarray,
+        **kwargs,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Gets the test-statistic and ns ratio of each parameter set."""
+        sob_m1 = self._sob_batch(chunk)
+        rows, cols = np.nonzero(sob_m1)
+        sob_m1 = sob_m1[rows, cols] - 1
+        n_dropped = self._n_events - np.bincount(rows, minlength=len(chunk))
+
+        if 'ns' in chunk.dtype.names:
+            ns_ratio = chunk['ns'] / self._n_events
+        else:
+            ns_ratio = self._newton_ns_ratio_rows(
+                sob_m1, rows, n_dropped, **kwargs)
+
+        llh, _ = self._llh(sob_m1, ns_ratio[rows])
+        _, drop_term = self._llh(np.zeros(len(chunk)), ns_ratio)
+        ts = -2 * (np.bincount(rows, llh, len(chunk)) + n_dropped * drop_term)
+        return ts, ns_ratio
+
+    def _sob_m1(self, params: np.ndarray) -> np.ndarray:
+        """Gets the sob of each kept event, minus one.
+
+        In log space, the terms' log_sob() are added and expm1() keeps full
+        precision for sob close to one.
+        """
+        const_sob, const_log_sob, terms = self._factors(params)
+
+        if self._log_space:
+            log_sob = const_log_sob.copy()
+            for term in terms:
+                log_sob += term.cached_call(
+                    params, self._events, log=True).reshape((-1,))
+            return np.expm1(log_sob)
+
+        if not terms:
+            return const_sob - 1
+
+        sob = const_sob * terms[0].cached_call(
+            params, self._events).reshape((-1,))
+        for term in terms[1:]:
+            sob *= term.cached_call(params, self._events).reshape((-1,))
+        sob -= 1
+        return sob
+
+    def _sob_batch(self, params: np.ndarray) -> np.ndarray:
+        """Builds the (parameter sets x events) signal-over-background matrix.
+        """
+        const_sob, _, terms = self._factors(params)
+        sob = np.empty((len(params), self._n_kept), dtype=self._dtype)
+        sob[:] = const_sob
+        for term in terms:
+            sob *= term.sob_batch(params, self._events)
         return sob
 
     def _newton_ns_ratio(
         self,
-        sob: np.ndarray,
-        newton_iterations: int = 20,
+        sob_m1: np.ndarray,
         **kwargs,
-    ) -> float:
-        """Docstring
+    ) -> Union[float, np.ndarray]:
+        """Fits the ns ratio for one or many sets of sob values.
 
         Args:
-            sob:
-            iterations:
+            sob_m1: An array of the sob of each kept event minus one, or a 2D
+                array of (parameter sets x kept events) to fit every row at
+                once.
 
         Returns:
+            The ns ratio, or an array of the ns ratio of each row.
+        """
+        if sob_m1.ndim == 1:
+            return self._newton_ns_ratio_rows(
+                sob_m1,
+                None,
+                np.array([self._n_dropped]),
+                **kwargs,
+            )[0]
+
+        return self._newton_ns_ratio_rows(
+            sob_m1.reshape((-1,)),
+            np.repeat(np.arange(len(sob_m1)), sob_m1.shape[1]),
+            np.full(len(sob_m1), self._n_dropped),
+            **kwargs,
+        )
+
+    @staticmethod
+    def _newton_ns_ratio_rows(
+        sob_m1: np.ndarray,
+        rows: Optional[np.ndarray],
+        n_dropped: np.ndarray,
+        newton_iterations: int = 20,
+        newton_tol: float = 1e-12,
+        **kwargs,
+    ) -> np.ndarray:
+        """Fits the ns ratio of many parameter sets simultaneously.
 
+        Each parameter set (row) may list only its non-zero sob values:
+        events with zero sob contribute exactly like dropped events, so they
+        can be counted in n_dropped instead. The iteration stops once no row
+        changes by more than newton_tol, and reuses one work buffer for every
+        step.
+
+        Args:
+            sob_m1: The sob values of every row minus one, concatenated.
+            rows: The row of each sob value, or None if there is only one row.
+            n_dropped: The number of dropped or zero-sob events of each row.
+            newton_iterations: The most iterations to take.
+            newton_tol: The largest change in any ns ratio to stop at. It is
+                raised to a few float32 epsilons for float32 sob values,
+                which cannot resolve smaller changes.
+
+        Returns:
+            An array of the ns ratio of each row.
         """
         # kwargs no-op
         len(kwargs)
 
         eps = 1e-5
-        k = 1 / (sob - 1)
-        x = [0] * newton_iterations
+        n_rows = len(n_dropped)
+        k = 1 / sob_m1
+        terms = np.empty_like(k)
+        x = np.zeros(n_rows)
+        newton_tol = max(newton_tol, 4 * np.finfo(k.dtype).eps)
+
+        def row_sum(values: np.ndarray) -> np.ndarray:
+            if rows is None:
+                return np.sum(values, keepdims=True, dtype=np.float64)
+            return np.bincount(rows, values, n_rows)
+
+        for _ in range(newton_iterations - 1):
+            # x + k is never 0, since k <= -1 when sob < 1, k > 0 when
+            # sob > 1, and x is clamped to [0, 1 - eps]. x is cast so that
+            # float32 sob values are not promoted.
+            if rows is None:
+                np.add(k, k.dtype.type(x[0]), out=terms)
+            else:
+                np.add(k, x[rows].astype(k.dtype), out=terms)
+            np.reciprocal(terms, out=terms)
+            d1 = row_sum(terms)
+            np.square(terms, out=terms)
+            d2 = row_sum(terms)
+
+            drop_term = 1 / (x - 1)
+            d1 += n_dropped * drop_term
+            d2 += n_dropped * drop_term**2
 
-        for i in range(newton_iterations - 1):
             # get next iteration and clamp
-            inv_terms = x[i] + k
-            inv_terms[inv_terms == 0] = eps
-            terms = 1 / inv_terms
-            drop_term = 1 / (x[i] - 1)
-            d1 = np.sum(terms) + self._n_dropped * drop_term
-            d2 = np.sum(terms**2) + self._n_dropped * drop_term**2
-            x[i + 1] = min(1 - eps, max(0, x[i] + d1 / d2))
+            x_next = np.clip(x + d1 / d2, 0, 1 - eps)
+            converged = np.all(np.abs(x_next - x) <= newton_tol)
+            x = x_next
 
-        return x[-1]
+            if converged:
+                break
+
+        return x
 
     def _llh(
         self,
-        sob: np.ndarray,
+        sob_m1: np.ndarray,
         ns_ratio: float,
     ) -> Tuple[np.ndarray, float]:
-        """Docstring"""
+        """Calculates the log-likelihood ratio of each event and of a dropped
+        event, using log1p() for precision when ns_ratio * (sob - 1) is small.
+
+        Args:
+            sob_m1: The sob of each event, minus one.
+            ns_ratio: The ns ratio.
+        """
+        # Cast the ns ratio so float32 sob values are not promoted
+        sign = np.sign(ns_ratio)
+        abs_ns_ratio = np.abs(ns_ratio)
         return (
-            np.sign(ns_ratio) * np.log(np.abs(ns_ratio) * (sob - 1) + 1),
-            np.sign(ns_ratio) * np.log(1 - np.abs(ns_ratio)),
+            sign.astype(sob_m1.dtype) * np.log1p(
+                abs_ns_ratio.astype(sob_m1.dtype) * sob_m1),
+            sign * np.log1p(-abs_ns_ratio),
         )
 
     @property
@@ -209,6 +785,25 @@ class LLHTestStatistic:
         """Docstring"""
         return self._n_kept
 
+    @property
+    def events(self) -> np.ndarray:
+        """The kept events."""
+        return self._events
+
+    @property
+    def sob_terms(self) -> List['SoBTerm']:
+        """Docstring"""
+        return self._sob_terms
+
+    @property
+    def has_gradient(self) -> bool:
+        """Whether value_and_gradient() can give an analytic gradient.
+
+        Only the terms that depend on the parameters of the last preprocess()
+        or update() need to have one.
+        """
+        return all(term.has_gradient for term in self._varying_terms)
+
     def _fix_bounds(
         self,
         bnds: List[Tuple[float, float]]
@@ -229,8 +824,20 @@ class LLHTestStatistic:
 
 @dataclasses.dataclass
 class SoBTerm:
-    """Docstring"""
+    """Docstring
+
+    Attributes:
+        cache_size (int): The number of recent results of __call__() to keep,
+            keyed by the values of the term's param_names. Zero disables the
+            cache, and terms with unknown param_names are never cached.
+        dtype (np.dtype): The floating point type of this term's per-event
+            arrays. LLHTestStatistic sets it on each of its terms.
+    """
     __metaclass__ = abc.ABCMeta
+    cache_size: int = dataclasses.field(init=False, default=0)
+    dtype: np.dtype = dataclasses.field(init=False, default=np.float64)
+    _cache: collections.OrderedDict = dataclasses.field(
+        init=False, default=None, repr=False)
 
     @abc.abstractmethod
     def preprocess(
@@ -246,9 +853,178 @@ class SoBTerm:
     def update(self, params: np.ndarray) -> None:
         """Docstring"""
 
+    def cached_call(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+        log: bool = False,
+    ) -> np.ndarray:
+        """Calls the term, reusing a recent result for the same parameters.
+
+        Only the values of the parameters in param_names are part of the
+        key. The returned arrays are shared with the cache, so they must not
+        be modified in place.
+
+        Args:
+            params: An array containing (*time_params, gamma).
+            events: The kept events.
+            log: If True, call log_sob() instead of __call__().
+
+        Returns:
+            The output of __call__() or log_sob().
+        """
+        evaluate = self.log_sob if log else self
+
+        if self.cache_size <= 0 or self.param_names is None:
+            return evaluate(params, events)
+
+        key = (log, *(
+            float(params[name]) for name in self.param_names
+            if name in params.dtype.names
+        ))
+
+        if self._cache is None:
+            self._cache = collections.OrderedDict()
+        elif key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        sob = evaluate(params, events)
+        self._cache[key] = sob
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return sob
+
+    def clear_cache(self) -> None:
+        """Forgets every cached result.
+
+        LLHTestStatistic calls this after the term's events change. A new
+        cache is made rather than clearing the old one, which may be shared
+        with a copy of this term.
+        """
+        self._cache = None
+
+    def log_sob(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """The natural log of __call__().
+
+        Terms that can compute it directly, without exponentiating, should
+        override this.
+
+        Args:
+            params: An array containing (*time_params, gamma).
+            events: The kept events.
+
+        Returns:
+            The log of this term for each event, which is -inf where the term
+            is not positive (e.g. tiny negative spline undershoots).
+        """
+        with np.errstate(divide='ignore'):
+            return np.log(np.maximum(self(params, events), 0))
+
+    @property
+    def param_names(self) -> Optional[Sequence[str]]:
+        """The names of the parameters this term depends on.
+
+        If none of them are fit, LLHTestStatistic evaluates the term once per
+        preprocess instead of on every call. None means the dependence is
+        unknown, so the term is always evaluated.
+        """
+        return None
+
+    def append_events(
+        self,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> np.ndarray:
+        """Preprocesses new events and appends them to this term's arrays.
+
+        Implementations must build new arrays rather than modify the existing
+        ones in place, so that copies made by LLHTestStatistic.with_events()
+        can share them.
+
+        Args:
+            events: The new events.
+            event_model: The event model used to preprocess.
+            source: The source used to preprocess.
+
+        Returns:
+            A boolean array of which new events to keep.
+        """
+
+    @property
+    def supports_append(self) -> bool:
+        """Whether append_events() is implemented.
+
+        Terms that implement append_events() should override this.
+        LLHTestStatistic.append_events() refuses terms without it.
+        """
+        return False
+
+    def sob_batch(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Evaluates this term for many parameter sets.
+
+        This implementation updates the term for each parameter set in turn.
+        Terms that can broadcast over their parameters should override it,
+        without modifying the term, so that LLHTestStatistic.evaluate_batch()
+        can be called from many threads at once.
+
+        Args:
+            params: A structured array of parameter sets.
+            events: The kept events.
+
+        Returns:
+            An array of shape (len(params), n_events), or one that broadcasts
+            to it.
+        """
+        sobs = []
+        for row in params:
+            self.update(row)
+            sobs.append(np.reshape(self(row, events), (-1,)))
+        return np.array(sobs)
+
+    def gradient(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Gets the derivatives of this term with respect to its parameters.
+
+        Args:
+            params: An array containing (*time_params, gamma).
+            events: The kept events.
+
+        Returns:
+            A dictionary of the derivative of this term for each event, keyed
+            by the names of the parameters it depends on, or None if this term
+            has no analytic gradient.
+        """
+
+    @property
+    def has_gradient(self) -> bool:
+        """Whether gradient() returns analytic derivatives.
+
+        Terms that implement gradient() should override this, so that fits
+        know whether to use it without evaluating it first.
+        """
+        return False
+
     @abc.abstractmethod
     def drop_events(self, drop_index: np.ndarray) -> None:
-        """Docstring"""
+        """Keeps only some of the preprocessed events.
+
+        Args:
+            drop_index: A boolean array over the events of which to keep, or
+                the indices of the events to keep, in increasing order.
+        """
 
     @abc.abstractmethod
     def __call__(
@@ -259,10 +1035,64 @@ class SoBTerm:
         """Docstring"""
 
 
+@dataclasses.dataclass
+class DecBandIndex:
+    """Finds the events near a point without looking at the rest.
+
+    The events are sorted by declination once, after which the events in a
+    declination band around any point are found by binary search. Only the
+    events in the band need their angular distance computed.
+
+    Attributes:
+        events (np.ndarray): The events to index.
+    """
+    events: dataclasses.InitVar[np.ndarray]
+    _order: np.ndarray = dataclasses.field(init=False, repr=False)
+    _sorted_dec: np.ndarray = dataclasses.field(init=False, repr=False)
+    _max_ang_err: float = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self, events: np.ndarray) -> None:
+        """Docstring"""
+        self._order = np.argsort(events['dec'], kind='stable')
+        self._sorted_dec = events['dec'][self._order]
+        self._max_ang_err = events['angErr'].max() if len(events) else 0
+
+    @property
+    def max_ang_err(self) -> float:
+        """The largest angular error of the indexed events."""
+        return self._max_ang_err
+
+    def query_band(self, dec: float, radius: float) -> np.ndarray:
+        """Returns the sorted indices of the events within radius in dec.
+
+        Args:
+            dec: The declination of the center of the band (radians).
+            radius: The half-width of the band (radians).
+        """
+        lower, upper = np.searchsorted(
+            self._sorted_dec, [dec - radius, dec + radius], side='left')
+        return np.sort(self._order[lower:upper])
+
+
 @dataclasses.dataclass
 class SpatialTerm(SoBTerm):
-    """Docstring"""
+    """Docstring
+
+    Attributes:
+        cut_sigma (Optional[float]): If given, only events within cut_sigma
+            times sqrt(angErr**2 + source sigma**2) of the source are kept,
+            and the events are found through a DecBandIndex of the trial. The
+            spatial signal pdf of every other event is below exp(-cut_sigma**2
+            / 2) of its peak value, and these events are treated as dropped
+            (signal-over-background of zero) by the test-statistic. At the
+            default of None, every event with a nonzero pdf is kept.
+    """
+    cut_sigma: Optional[float] = None
     _sob_spatial: np.ndarray = dataclasses.field(init=False)
+    _index: Optional[DecBandIndex] = dataclasses.field(
+        init=False, repr=False, default=None)
+    _indexed_events: Optional[np.ndarray] = dataclasses.field(
+        init=False, repr=False, default=None)
 
     def preprocess(
         self,
@@ -273,14 +1103,101 @@ class SpatialTerm(SoBTerm):
         source: sources.Source,
     ) -> Tuple[np.ndarray, Bounds]:
         """Docstring"""
-        self._sob_spatial = self.gauassian_spatial_pdf(events, source)
-        drop_index = self._sob_spatial != 0
+        if self.cut_sigma is None:
+            self._sob_spatial, drop_index = self._spatial_sob(
+                events, event_model, source)
+            return drop_index, bounds
+
+        # The index is built once per trial, so reusing the same events for
+        # many sources only pays for the sort once.
+        if self._indexed_events is not events:
+            self._index = DecBandIndex(events)
+            self._indexed_events = events
+
+        _, src_dec = source.get_location()
+        band = self._index.query_band(
+            src_dec,
+            self.cut_sigma * np.sqrt(
+                self._index.max_ang_err**2 + source.get_sigma()**2),
+        )
+
+        self._sob_spatial, drop_index = self._cone_sob(
+            events, band, event_model, source)
+        return drop_index, bounds
+
+    def append_events(
+        self,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> np.ndarray:
+        """Docstring"""
+        if self.cut_sigma is None:
+            sob_spatial, drop_index = self._spatial_sob(
+                events, event_model, source)
+        else:
+            sob_spatial, drop_index = self._cone_sob(
+                events, np.arange(len(events)), event_model, source)
+        self._sob_spatial = np.concatenate([self._sob_spatial, sob_spatial])
+        return drop_index
+
+    @property
+    def supports_append(self) -> bool:
+        """Docstring"""
+        return True
 
-        self._sob_spatial[drop_index] /= event_model.background_spatial_pdf(
+    @property
+    def param_names(self) -> Optional[Sequence[str]]:
+        """Docstring"""
+        return []
+
+    def _spatial_sob(
+        self,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Docstring"""
+        sob_spatial = self.gauassian_spatial_pdf(events, source)
+        drop_index = sob_spatial != 0
+
+        sob_spatial[drop_index] /= event_model.background_spatial_pdf(
             events[drop_index],
         )
 
-        return drop_index, bounds
+        return sob_spatial.astype(self.dtype, copy=False), drop_index
+
+    def _cone_sob(
+        self,
+        events: np.ndarray,
+        candidates: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Evaluates the candidate events that are within the cone.
+
+        Args:
+            events: All of the events.
+            candidates: The sorted indices of the events that may be within
+                the cone.
+            event_model: The event model to get the background pdf from.
+            source: The source at the center of the cone.
+
+        Returns:
+            The signal-over-background of every event (zero outside the
+            cone) and a mask of the events to keep.
+        """
+        ra, dec = source.get_location()
+        candidate_events = events[candidates]
+        dist_sq = angular_distance_sq(candidate_events, ra, dec)
+        in_cone = dist_sq <= self.cut_sigma**2 * (
+            candidate_events['angErr']**2 + source.get_sigma()**2)
+
+        sob_spatial = np.zeros(len(events), dtype=self.dtype)
+        drop_index = np.zeros(len(events), dtype=bool)
+        sob_spatial[candidates[in_cone]], drop_index[candidates[in_cone]] = (
+            self._spatial_sob(candidate_events[in_cone], event_model, source))
+        return sob_spatial, drop_index
 
     def gauassian_spatial_pdf(
         self,
@@ -290,15 +1207,14 @@ class SpatialTerm(SoBTerm):
         """Docstring"""
         ra, dec = source.get_location()
         sigma_sq = events['angErr']**2 + source.get_sigma()**2
-        dist = angular_distance(events['ra'], events['dec'], ra,
-                                dec)
+        dist_sq = angular_distance_sq(events, ra, dec)
         norm = 1 / (2 * np.pi * sigma_sq)
-        return norm * np.exp(-dist**2 / (2 * sigma_sq))
+        return norm * np.exp(-dist_sq / (2 * sigma_sq))
 
     def drop_events(self, drop_index: np.ndarray) -> None:
         """Docstring"""
         contiguous_sob_spatial = np.empty(
-            drop_index.sum(),
+            _n_selected(drop_index),
             dtype=self._sob_spatial.dtype,
         )
 
@@ -313,6 +1229,207 @@ class SpatialTerm(SoBTerm):
         """Docstring"""
         return self._sob_spatial
 
+    def sob_batch(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Docstring"""
+        return self._sob_spatial[np.newaxis, :]
+
+    def gradient(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Docstring"""
+        return {}
+
+    @property
+    def has_gradient(self) -> bool:
+        """Docstring"""
+        return True
+
+
+@dataclasses.dataclass
+class StackedSpatialTerm(SoBTerm):
+    """A spatial term for a weighted catalog of sources.
+
+    The signal spatial pdf is the weighted mean of the Gaussian spatial pdfs
+    of the sources in the catalog. Preprocessing stores the spatial
+    signal-over-background of every source and event pair within the cone
+    cut in a sparse (CSR) source-by-event matrix, so each evaluation is one
+    sparse matrix-vector product with the normalized weights. Events outside
+    the cone of every source are dropped. The source given to preprocess()
+    is ignored.
+
+    Attributes:
+        catalog (List[sources.Source]): The sources to stack.
+        weights (Optional[np.ndarray]): Fixed relative weights of the
+            sources. Defaults to equal weights.
+        weight_function (Optional[Callable[[np.ndarray], np.ndarray]]): If
+            given, a function of the fit parameters returning a relative
+            weight per source, multiplied into weights on every evaluation.
+        weight_param_names (Optional[Sequence[str]]): The names of the
+            parameters weight_function depends on. None means it may depend on
+            any of them.
+        cut_sigma (Optional[float]): As in SpatialTerm. None keeps every
+            event for every source, which makes the matrix dense.
+    """
+    catalog: List[sources.Source]
+    weights: Optional[np.ndarray] = None
+    weight_function: Optional[Callable[[np.ndarray], np.ndarray]] = None
+    weight_param_names: Optional[Sequence[str]] = None
+    cut_sigma: Optional[float] = 5
+    _sob_matrix: scipy.sparse.csr_matrix = dataclasses.field(init=False)
+
+    def preprocess(
+        self,
+        params: np.ndarray,
+        bounds: Bounds,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> Tuple[np.ndarray, Bounds]:
+        """Docstring"""
+        self._sob_matrix, drop_index = self._stacked_sob(events, event_model)
+        return drop_index, bounds
+
+    def append_events(
+        self,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> np.ndarray:
+        """Docstring"""
+        sob_matrix, drop_index = self._stacked_sob(events, event_model)
+        self._sob_matrix = scipy.sparse.hstack(
+            [self._sob_matrix, sob_matrix], format='csr')
+        return drop_index
+
+    @property
+    def supports_append(self) -> bool:
+        """Docstring"""
+        return True
+
+    @property
+    def param_names(self) -> Optional[Sequence[str]]:
+        """Docstring"""
+        if self.weight_function is None:
+            return []
+        return self.weight_param_names
+
+    def _stacked_sob(
+        self,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+    ) -> Tuple[scipy.sparse.csr_matrix, np.ndarray]:
+        """Builds the source-by-event signal-over-background matrix.
+
+        Returns:
+            The matrix and a mask of the events that are kept.
+        """
+        index = DecBandIndex(events)
+        rows, cols, dists_sq = [], [], []
+
+        for i, src in enumerate(self.catalog):
+            src_ra, src_dec = src.get_location()
+            if self.cut_sigma is None:
+                candidates = np.arange(len(events))
+            else:
+                candidates = index.query_band(
+                    src_dec,
+                    self.cut_sigma * np.sqrt(
+                        index.max_ang_err**2 + src.get_sigma()**2),
+                )
+
+            dist_sq = angular_distance_sq(events[candidates], src_ra, src_dec)
+            if self.cut_sigma is not None:
+                in_cone = dist_sq <= self.cut_sigma**2 * (
+                    events['angErr'][candidates]**2 + src.get_sigma()**2)
+                candidates, dist_sq = candidates[in_cone], dist_sq[in_cone]
+
+            rows.append(np.full(len(candidates), i))
+            cols.append(candidates)
+            dists_sq.append(dist_sq)
+
+        rows, cols, dists_sq = (
+            np.concatenate([np.empty(0, dtype=int), *rows]),
+            np.concatenate([np.empty(0, dtype=int), *cols]),
+            np.concatenate([np.empty(0), *dists_sq]),
+        )
+
+        src_sigmas = np.array([src.get_sigma() for src in self.catalog])
+        sigma_sq = events['angErr'][cols]**2 + src_sigmas[rows]**2
+        sob = np.exp(-dists_sq / (2 * sigma_sq)) / (2 * np.pi * sigma_sq)
+
+        drop_index = np.bincount(
+            cols[sob != 0], minlength=len(events)).astype(bool)
+        bg_pdf = np.ones(len(events))
+        if drop_index.any():
+            bg_pdf[drop_index] = event_model.background_spatial_pdf(
+                events[drop_index])
+        sob /= bg_pdf[cols]
+
+        sob_matrix = scipy.sparse.csr_matrix(
+            (sob.astype(self.dtype, copy=False), (rows, cols)),
+            shape=(len(self.catalog), len(events)),
+        )
+        return sob_matrix, drop_index
+
+    def _normalized_weights(self, params: np.ndarray) -> np.ndarray:
+        """Gets the source weights for params, normalized to sum to one."""
+        if self.weights is None:
+            weights = np.ones(len(self.catalog))
+        else:
+            weights = np.asarray(self.weights, dtype=np.float64)
+
+        if self.weight_function is not None:
+            weights = weights * self.weight_function(params)
+
+        return weights / weights.sum()
+
+    def drop_events(self, drop_index: np.ndarray) -> None:
+        """Docstring"""
+        self._sob_matrix = self._sob_matrix[:, drop_index]
+
+    def __call__(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Docstring"""
+        weights = self._normalized_weights(params).astype(self.dtype)
+        return self._sob_matrix.T.dot(weights)
+
+    def sob_batch(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Docstring"""
+        if self.weight_function is None:
+            return self(params[0], events)[np.newaxis, :]
+
+        weights = np.stack(
+            [self._normalized_weights(row) for row in params], axis=1)
+        return self._sob_matrix.T.dot(weights.astype(self.dtype)).T
+
+    def gradient(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Docstring"""
+        if self.weight_function is None:
+            return {}
+        return None
+
+    @property
+    def has_gradient(self) -> bool:
+        """Docstring"""
+        return self.weight_function is None
+
 
 @dataclasses.dataclass
 class TimeTerm(SoBTerm):
@@ -331,32 +1448,60 @@ class TimeTerm(SoBTerm):
         source: sources.Source,
     ) -> Tuple[np.ndarray, Bounds]:
         """Docstring"""
-        self._times = np.empty(len(events), dtype=events['time'].dtype)
-        self._times[:] = events['time'][:]
-        self._sob_bg = 1 / self.background_time_profile.pdf(self._times)
+        self._times, self._sob_bg = self._time_sob_bg(events)
         self.signal_time_profile.update_params(params)
         drop_index = self._sob_bg != 0
+        return drop_index, bounds
+
+    def append_events(
+        self,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> np.ndarray:
+        """Docstring"""
+        times, sob_bg = self._time_sob_bg(events)
+        self._times = np.concatenate([self._times, times])
+        self._sob_bg = np.concatenate([self._sob_bg, sob_bg])
+        return sob_bg != 0
+
+    @property
+    def supports_append(self) -> bool:
+        """Docstring"""
+        return True
+
+    def _time_sob_bg(self, events: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Docstring"""
+        times = np.empty(len(events), dtype=events['time'].dtype)
+        times[:] = events['time'][:]
+        sob_bg = 1 / self.background_time_profile.pdf(times)
 
-        if np.logical_not(np.all(np.isfinite(self._sob_bg))):
+        if np.logical_not(np.all(np.isfinite(sob_bg))):
             warnings.warn(
                 'Warning, events outside background time profile',
                 RuntimeWarning
             )
 
-        return drop_index, bounds
+        # The times stay in float64: float32 would round MJDs to minutes
+        return times, sob_bg.astype(self.dtype, copy=False)
 
     def update(self, params: np.ndarray) -> None:
         """Docstring"""
         self.signal_time_profile.update_params(params)
 
+    @property
+    def param_names(self) -> Optional[Sequence[str]]:
+        """Docstring"""
+        return self.signal_time_profile.param_dtype.names
+
     def drop_events(self, drop_index: np.ndarray) -> None:
         """Docstring"""
         contiguous_times = np.empty(
-            drop_index.sum(),
+            _n_selected(drop_index),
             dtype=self._times.dtype,
         )
         contiguous_sob_bg = np.empty(
-            drop_index.sum(),
+            _n_selected(drop_index),
             dtype=self._sob_bg.dtype,
         )
 
@@ -371,15 +1516,54 @@ class TimeTerm(SoBTerm):
         events: np.ndarray,
     ) -> np.ndarray:
         """Docstring"""
-        return self._sob_bg * self.signal_time_profile.pdf(self._times)
+        self.signal_time_profile.update_params(params)
+        return np.multiply(
+            self._sob_bg,
+            self.signal_time_profile.pdf(self._times),
+            dtype=self.dtype,
+        )
+
+    def sob_batch(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Docstring"""
+        return np.multiply(
+            self._sob_bg,
+            self.signal_time_profile.pdf_batch(self._times, params),
+            dtype=self.dtype,
+        )
+
+    def gradient(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Docstring"""
+        self.signal_time_profile.update_params(params)
+        pdf_gradient = self.signal_time_profile.pdf_gradient(self._times)
+
+        if pdf_gradient is None:
+            return None
+
+        return {
+            name: self._sob_bg * dpdf for name, dpdf in pdf_gradient.items()}
+
+    @property
+    def has_gradient(self) -> bool:
+        """Docstring"""
+        return self.signal_time_profile.has_pdf_gradient
 
 
 @dataclasses.dataclass
 class I3EnergyTerm(SoBTerm):
     """Docstring"""
-    _spline_idxs: np.ndarray = dataclasses.field(init=False)
-    _splines: List = dataclasses.field(init=False)
+    _event_table_idxs: np.ndarray = dataclasses.field(init=False)
+    _table_idxs: np.ndarray = dataclasses.field(init=False)
     _energy_sob: Callable = dataclasses.field(init=False)
+    _energy_sob_gradient: Callable = dataclasses.field(init=False)
+    _energy_log_sob: Callable = dataclasses.field(init=False)
     gamma: float = -2
 
     def preprocess(
@@ -392,19 +1576,47 @@ class I3EnergyTerm(SoBTerm):
     ) -> Tuple[np.ndarray, Bounds]:
         """Docstring"""
         self._energy_sob = event_model.get_sob_energy
+        self._energy_sob_gradient = event_model.get_sob_energy_gradient
+        self._energy_log_sob = event_model.get_log_sob_energy
         spline_tuple = event_model.log_sob_spline_prepro(events)
-        self._spline_idxs, self._splines = spline_tuple
+        self._event_table_idxs, self._table_idxs = spline_tuple
         return np.ones(len(events), dtype=bool), bounds
 
+    def append_events(
+        self,
+        events: np.ndarray,
+        event_model: models.I3EventModel,
+        source: sources.Source,
+    ) -> np.ndarray:
+        """Docstring"""
+        event_table_idxs, table_idxs = event_model.log_sob_spline_prepro(
+            events)
+        self._event_table_idxs = np.concatenate([
+            self._event_table_idxs,
+            event_table_idxs + len(self._table_idxs),
+        ])
+        self._table_idxs = np.concatenate([self._table_idxs, table_idxs])
+        return np.ones(len(events), dtype=bool)
+
+    @property
+    def supports_append(self) -> bool:
+        """Docstring"""
+        return True
+
+    @property
+    def param_names(self) -> Optional[Sequence[str]]:
+        """Docstring"""
+        return ['gamma']
+
     def drop_events(self, drop_index: np.ndarray) -> None:
         """Docstring"""
-        to_calculate, contiguous_spline_idxs = np.unique(
-            self._spline_idxs[drop_index],
+        to_calculate, contiguous_event_table_idxs = np.unique(
+            self._event_table_idxs[drop_index],
             return_inverse=True,
         )
 
-        self._splines = [self._splines[i] for i in to_calculate]
-        self._spline_idxs = contiguous_spline_idxs
+        self._table_idxs = self._table_idxs[to_calculate]
+        self._event_table_idxs = contiguous_event_table_idxs.reshape((-1,))
 
     def __call__(
         self,
@@ -417,7 +1629,61 @@ class I3EnergyTerm(SoBTerm):
         else:
             gamma = self.gamma
 
-        return self._energy_sob(gamma, self._splines, self._spline_idxs)
+        return self._energy_sob(
+            gamma, self._table_idxs, self._event_table_idxs, self.dtype)
+
+    def log_sob(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Evaluates the log(sob) splines without exponentiating them."""
+        if 'gamma' in params.dtype.names:
+            gamma = params['gamma']
+        else:
+            gamma = self.gamma
+
+        return self._energy_log_sob(
+            gamma, self._table_idxs, self._event_table_idxs, self.dtype)
+
+    def sob_batch(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Evaluates the energy sob once per unique gamma in params."""
+        if 'gamma' not in params.dtype.names:
+            return self._energy_sob(
+                self.gamma,
+                self._table_idxs,
+                self._event_table_idxs,
+                self.dtype,
+            )[np.newaxis, :]
+
+        gammas, gamma_idxs = np.unique(params['gamma'], return_inverse=True)
+        sobs = np.array([
+            self._energy_sob(
+                gamma, self._table_idxs, self._event_table_idxs, self.dtype)
+            for gamma in gammas
+        ])
+        return sobs[gamma_idxs.reshape((-1,))]
+
+    def gradient(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Docstring"""
+        if 'gamma' not in params.dtype.names:
+            return {}
+
+        return {'gamma': self._energy_sob_gradient(
+            params['gamma'], self._table_idxs, self._event_table_idxs)}
+
+    @property
+    def has_gradient(self) -> bool:
+        """Docstring"""
+        return True
 
 
 @dataclasses.dataclass
@@ -441,14 +1707,39 @@ class ThreeMLEnergyTerm(SoBTerm):
             events)
         return np.ones(len(events), dtype=bool), bounds
 
+    def append_events(
+        self,
+        events: np.ndarray,
+        event_model: _models.EventModel,
+        source: sources.Source,
+    ) -> np.ndarray:
+        """Docstring"""
+        sin_dec_idx, log_energy_idx = event_model.prepro_index(events)
+        self._sin_dec_idx = np.concatenate([self._sin_dec_idx, sin_dec_idx])
+        self._log_energy_idx = np.concatenate([
+            self._log_energy_idx,
+            log_energy_idx,
+        ])
+        return np.ones(len(events), dtype=bool)
+
+    @property
+    def supports_append(self) -> bool:
+        """Docstring"""
+        return True
+
+    @property
+    def param_names(self) -> Optional[Sequence[str]]:
+        """Docstring"""
+        return []
+
     def drop_events(self, drop_index: np.ndarray) -> None:
         """Docstring"""
         contiguous_sin_dec_idx = np.empty(
-            drop_index.sum(),
+            _n_selected(drop_index),
             dtype=self._sin_dec_idx.dtype,
         )
         contiguous_log_energy_idx = np.empty(
-            drop_index.sum(),
+            _n_selected(drop_index),
             dtype=self._log_energy_idx.dtype,
         )
 
@@ -464,4 +1755,31 @@ class ThreeMLEnergyTerm(SoBTerm):
     ) -> np.ndarray:
         """Docstring"""
 
-        return self._energy_sob(self._sin_dec_idx, self._log_energy_idx)
+        return self._energy_sob(
+            self._sin_dec_idx,
+            self._log_energy_idx,
+        ).astype(self.dtype, copy=False)
+
+    def sob_batch(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> np.ndarray:
+        """Docstring"""
+        return self._energy_sob(
+            self._sin_dec_idx,
+            self._log_energy_idx,
+        ).astype(self.dtype, copy=False)[np.newaxis, :]
+
+    def gradient(
+        self,
+        params: np.ndarray,
+        events: np.ndarray,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Docstring"""
+        return {}
+
+    @property
+    def has_gradient(self) -> bool:
+        """Docstring"""
+        return True
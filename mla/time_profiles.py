@@ -16,6 +16,7 @@ __status__ = 'Development'
 from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import abc
+import copy
 import numpy as np
 import scipy.stats
 
@@ -55,6 +56,48 @@ class GenericProfile:
             A numpy array of probability amplitudes at the given times.
         """
 
+    def pdf_batch(self, times: np.array, params: np.ndarray) -> np.array:
+        """Get the probability amplitudes for many sets of fitting parameters.
+
+        This implementation updates a copy of the profile for each parameter
+        set. Profiles that can broadcast over their parameters should override
+        it. This profile's own parameters are left unchanged.
+
+        Args:
+            times: An array of event times to get the probability amplitude for.
+            params: A structured array of parameter sets.
+
+        Returns:
+            A 2D array of probability amplitudes of shape
+            (len(params), len(times)).
+        """
+        profile = copy.deepcopy(self)
+        pdfs = np.empty((len(params), len(times)))
+        for i, row in enumerate(params):
+            profile.update_params(row)
+            pdfs[i] = profile.pdf(times)
+        return pdfs
+
+    def pdf_gradient(self, times: np.array) -> Optional[Dict[str, np.array]]:
+        """Get the derivatives of the pdf with respect to the fit parameters.
+
+        Profiles without analytic derivatives return None, in which case fits
+        fall back to finite differences.
+
+        Args:
+            times: An array of event times to get the derivatives for.
+
+        Returns:
+            A dictionary of arrays of derivatives at the given times, keyed by
+            parameter name, or None.
+        """
+        del times  # Unused.
+
+    @property
+    def has_pdf_gradient(self) -> bool:
+        """Whether pdf_gradient() returns analytic derivatives."""
+        return False
+
     @abc.abstractmethod
     def logpdf(self, times: np.array) -> np.array:
         """Get the log(probability) given a time for this time profile.
@@ -67,11 +110,13 @@ class GenericProfile:
         """
 
     @abc.abstractmethod
-    def random(self, size: int) -> np.array:
+    def random(self, size: int,
+               rng: Optional[np.random.Generator] = None) -> np.array:
         """Get random times sampled from the pdf of this time profile.
 
         Args:
             size: The number of times to return.
+            rng: The random number generator to sample with.
 
         Returns:
             An array of times.
@@ -114,9 +159,22 @@ class GenericProfile:
         """Docstring"""
 
     @abc.abstractmethod
-    def inverse_transform_sample(self, start_times: np.array,
-                                 stop_times: np.array) -> np.array:
-        """Docstring"""
+    def inverse_transform_sample(
+        self,
+        start_times: np.array,
+        stop_times: np.array,
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.array:
+        """Samples times between the given start and stop times.
+
+        Args:
+            start_times: The lower bound of each time to sample.
+            stop_times: The upper bound of each time to sample.
+            rng: The random number generator to sample with.
+
+        Returns:
+            An array of times.
+        """
 
     @abc.abstractmethod
     def update_params(self, params: np.ndarray) -> bool:
@@ -187,6 +245,48 @@ class GaussProfile(GenericProfile):
         """
         return self.scipy_dist.pdf(times)
 
+    def pdf_batch(self, times: np.array, params: np.ndarray) -> np.array:
+        """Calculates the probability for each time and parameter set.
+
+        Args:
+            times: A numpy list of times to evaluate.
+            params: A structured array of parameter sets.
+
+        Returns:
+            A 2D array of probability amplitudes of shape
+            (len(params), len(times)).
+        """
+        mean, sigma = self.mean, self.sigma
+        if 'mean' in params.dtype.names:
+            mean = np.reshape(params['mean'], (-1, 1))
+        if 'sigma' in params.dtype.names:
+            sigma = np.reshape(params['sigma'], (-1, 1))
+        return np.broadcast_to(
+            scipy.stats.norm.pdf(times, mean, sigma),
+            (len(params), len(times)),
+        )
+
+    def pdf_gradient(self, times: np.array) -> Optional[Dict[str, np.array]]:
+        """Calculates the derivatives of the pdf at each time.
+
+        Args:
+            times: A numpy list of times to evaluate.
+
+        Returns:
+            The derivatives with respect to mean and sigma.
+        """
+        pdf = self.pdf(times)
+        residuals = (times - self.mean) / self.sigma
+        return {
+            'mean': pdf * residuals / self.sigma,
+            'sigma': pdf * (residuals**2 - 1) / self.sigma,
+        }
+
+    @property
+    def has_pdf_gradient(self) -> bool:
+        """Docstring"""
+        return True
+
     def logpdf(self, times: np.array) -> np.array:
         """Calculates the log(probability) for each time.
 
@@ -198,16 +298,20 @@ class GaussProfile(GenericProfile):
         """
         return self.scipy_dist.logpdf(times)
 
-    def random(self, size: int = 1) -> np.array:
+    def random(self, size: int = 1,
+               rng: Optional[np.random.Generator] = None) -> np.array:
         """Returns random values following the gaussian distribution.
 
         Args:
             size: The number of random values to return.
+            rng: The random number generator to sample with.
 
         Returns:
             An array of times.
         """
-        return self.scipy_dist.rvs(size=size)
+        if rng is None:
+            rng = np.random.default_rng()
+        return self.scipy_dist.rvs(size=size, random_state=rng)
 
     def x0(self, times: np.array) -> Tuple[float, float]:
         """Returns good guesses for mean and sigma based on given times.
@@ -247,11 +351,17 @@ class GaussProfile(GenericProfile):
     def cdf(self, times: np.array) -> np.array:
         return self.scipy_dist.cdf(times)
 
-    def inverse_transform_sample(self, start_times: np.array,
-                                 stop_times: np.array) -> np.array:
+    def inverse_transform_sample(
+        self,
+        start_times: np.array,
+        stop_times: np.array,
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.array:
+        if rng is None:
+            rng = np.random.default_rng()
         start_cdfs = self.cdf(start_times)
         stop_cdfs = self.cdf(stop_times)
-        cdfs = np.random.uniform(start_cdfs, stop_cdfs)
+        cdfs = rng.uniform(start_cdfs, stop_cdfs)
         return self.scipy_dist.ppf(cdfs)
 
     def update_params(self, params: np.ndarray) -> bool:
@@ -311,6 +421,8 @@ class UniformProfile(GenericProfile):
             length: (days) length of the uniform distribution.
         """
         super().__init__()
+        self.start = start
+        self.length = length
         self._range = (start, start + length)
         self._default_params = {'start': self._range[0], 'length': length}
         self._param_dtype = np.dtype(
@@ -331,6 +443,50 @@ class UniformProfile(GenericProfile):
         ] = 1 / (self._range[1] - self._range[0])
         return output
 
+    def pdf_batch(self, times: np.array, params: np.ndarray) -> np.array:
+        """Calculates the probability for each time and parameter set.
+
+        Args:
+            times: A numpy list of times to evaluate.
+            params: A structured array of parameter sets.
+
+        Returns:
+            A 2D array of probability amplitudes of shape
+            (len(params), len(times)).
+        """
+        start, length = self._range[0], self._range[1] - self._range[0]
+        if 'start' in params.dtype.names:
+            start = np.reshape(params['start'], (-1, 1))
+        if 'length' in params.dtype.names:
+            length = np.reshape(params['length'], (-1, 1))
+        in_window = (times >= start) & (times < start + length)
+        with np.errstate(divide='ignore'):  # zero-length windows are empty
+            pdfs = np.where(in_window, 1 / length, 0)
+        return np.broadcast_to(pdfs, (len(params), len(times)))
+
+    def pdf_gradient(self, times: np.array) -> Optional[Dict[str, np.array]]:
+        """Calculates the derivatives of the pdf at each time.
+
+        Events entering or leaving the window are step changes, so only the
+        smooth dependence on the window length contributes.
+
+        Args:
+            times: A numpy list of times to evaluate.
+
+        Returns:
+            The derivatives with respect to start and length.
+        """
+        pdf = self.pdf(times)
+        return {
+            'start': np.zeros_like(pdf),
+            'length': -pdf / (self._range[1] - self._range[0]),
+        }
+
+    @property
+    def has_pdf_gradient(self) -> bool:
+        """Docstring"""
+        return True
+
     def logpdf(self, times: np.array) -> np.array:
         """Calculates the log(probability) for each time.
 
@@ -342,16 +498,20 @@ class UniformProfile(GenericProfile):
         """
         return np.log(self.pdf(times))
 
-    def random(self, size: int = 1) -> np.array:
+    def random(self, size: int = 1,
+               rng: Optional[np.random.Generator] = None) -> np.array:
         """Returns random values following the uniform distribution.
 
         Args:
             size: The number of random values to return.
+            rng: The random number generator to sample with.
 
         Returns:
             An array of times.
         """
-        return np.random.uniform(*self._range, size)
+        if rng is None:
+            rng = np.random.default_rng()
+        return rng.uniform(*self._range, size)
 
     def x0(self, times: np.array) -> Tuple[float, float]:
         """Returns good guesses for start and stop based on given times.
@@ -387,9 +547,15 @@ class UniformProfile(GenericProfile):
             1,
         )
 
-    def inverse_transform_sample(self, start_times: np.array,
-                                 stop_times: np.array) -> np.array:
-        return np.random.uniform(
+    def inverse_transform_sample(
+        self,
+        start_times: np.array,
+        stop_times: np.array,
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.array:
+        if rng is None:
+            rng = np.random.default_rng()
+        return rng.uniform(
             np.maximum(start_times, self.range[0]),
             np.minimum(stop_times, self.range[1]),
         )
@@ -524,16 +690,20 @@ class CustomProfile(GenericProfile):
         """
         return self.dist.logpdf(times + self.offset)
 
-    def random(self, size: int = 1) -> np.array:
+    def random(self, size: int = 1,
+               rng: Optional[np.random.Generator] = None) -> np.array:
         """Returns random values following the uniform distribution.
 
         Args:
             size: The number of random values to return.
+            rng: The random number generator to sample with.
 
         Returns:
             An array of random values sampled from the histogram distribution.
         """
-        return self.dist.rvs(size=size) + self.offset
+        if rng is None:
+            rng = np.random.default_rng()
+        return self.dist.rvs(size=size, random_state=rng) + self.offset
 
     def x0(self, times: np.array) -> Tuple[float, float]:
         """Gives a guess of the parameters of this type of time profile.
@@ -564,11 +734,17 @@ class CustomProfile(GenericProfile):
     def cdf(self, times: np.array) -> np.array:
         return self.dist.cdf(times)
 
-    def inverse_transform_sample(self, start_times: np.array,
-                                 stop_times: np.array) -> np.array:
+    def inverse_transform_sample(
+        self,
+        start_times: np.array,
+        stop_times: np.array,
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.array:
+        if rng is None:
+            rng = np.random.default_rng()
         start_cdfs = self.cdf(start_times)
         stop_cdfs = self.cdf(stop_times)
-        cdfs = np.random.uniform(start_cdfs, stop_cdfs)
+        cdfs = rng.uniform(start_cdfs, stop_cdfs)
         return self.dist.ppf(cdfs)
 
     def update_params(self, params: np.ndarray) -> bool:
@@ -0,0 +1,152 @@
+"""
+Streaming accumulation of test-statistic distributions, so that very large
+numbers of trials can be summarized without keeping every result in memory.
+"""
+
+__author__ = 'John Evans'
+__copyright__ = 'Copyright 2020 John Evans'
+__credits__ = ['John Evans', 'Jason Fan', 'Michael Larson']
+__license__ = 'Apache License 2.0'
+__version__ = '0.0.1'
+__maintainer__ = 'John Evans'
+__email__ = 'john.evans@icecube.wisc.edu'
+__status__ = 'Development'
+
+from typing import List
+
+import numpy as np
+
+from dataclasses import dataclass
+from dataclasses import field
+
+
+@dataclass
+class TSAccumulator:
+    """A mergeable summary of a test-statistic distribution.
+
+    Values between lower and threshold are counted in a fixed histogram of
+    n_bins equal-width bins, and values at or above threshold are stored
+    exactly, so the upper tail (where small p-values live) has no binning
+    error. Values below lower are counted in the first bin. Memory use is
+    then flat in the number of trials, apart from the (usually small) tail.
+
+    Attributes:
+        lower (float): The lower edge of the histogram.
+        threshold (float): The value at and above which values are stored
+            exactly.
+        n_bins (int): The number of histogram bins between lower and
+            threshold.
+    """
+    lower: float = 0
+    threshold: float = 10
+    n_bins: int = 100000
+    _counts: np.ndarray = field(init=False, repr=False)
+    _tail: List[np.ndarray] = field(init=False, repr=False)
+    _n_trials: int = field(init=False, repr=False)
+    _sorted: bool = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Docstring"""
+        if self.threshold <= self.lower:
+            raise ValueError('threshold must be greater than lower.')
+        self._counts = np.zeros(self.n_bins, dtype=np.int64)
+        self._tail = []
+        self._n_trials = 0
+        self._sorted = False
+
+    @property
+    def n_trials(self) -> int:
+        """The number of values accumulated."""
+        return self._n_trials
+
+    @property
+    def tail(self) -> np.ndarray:
+        """The sorted values at or above threshold."""
+        if not self._sorted:
+            self._tail = [np.sort(np.concatenate([np.empty(0), *self._tail]))]
+            self._sorted = True
+        return self._tail[0]
+
+    @property
+    def _width(self) -> float:
+        """Docstring"""
+        return (self.threshold - self.lower) / self.n_bins
+
+    def add(self, ts: np.ndarray) -> None:
+        """Adds one or more test-statistic values to the distribution.
+
+        Args:
+            ts: A value or array of values.
+        """
+        ts = np.atleast_1d(np.asarray(ts, dtype=float))
+        in_tail = ts >= self.threshold
+
+        idx = np.floor((ts[~in_tail] - self.lower) / self._width)
+        idx = np.clip(idx, 0, self.n_bins - 1).astype(int)
+        self._counts += np.bincount(idx, minlength=self.n_bins)
+
+        if in_tail.any():
+            self._tail.append(ts[in_tail])
+            self._sorted = False
+        self._n_trials += len(ts)
+
+    def copy_empty(self) -> 'TSAccumulator':
+        """Returns an empty accumulator with the same binning."""
+        return TSAccumulator(self.lower, self.threshold, self.n_bins)
+
+    def merge(self, other: 'TSAccumulator') -> None:
+        """Adds the contents of another accumulator to this one.
+
+        Raises:
+            ValueError: If the accumulators have different binning.
+        """
+        if (self.lower, self.threshold, self.n_bins) != (
+            other.lower, other.threshold, other.n_bins
+        ):
+            raise ValueError('Cannot merge accumulators with different bins.')
+
+        self._counts += other._counts  # pylint: disable=protected-access
+        self._tail.extend(other._tail)  # pylint: disable=protected-access
+        self._sorted = False
+        self._n_trials += other.n_trials
+
+    def p_value(self, ts: float) -> float:
+        """The fraction of accumulated values greater than or equal to ts.
+
+        Within a histogram bin, values are treated as uniformly distributed.
+        """
+        if self._n_trials == 0:
+            raise ValueError('No values have been accumulated.')
+
+        n_above = len(self.tail) - np.searchsorted(self.tail, ts, side='left')
+
+        if ts < self.threshold:
+            pos = max(0, (ts - self.lower) / self._width)
+            idx = min(int(pos), self.n_bins - 1)
+            n_above += self._counts[idx + 1:].sum()
+            n_above += self._counts[idx] * (1 - (pos - idx))
+
+        return n_above / self._n_trials
+
+    def quantile(self, q: float) -> float:
+        """The value below which a fraction q of the values lie.
+
+        Within a histogram bin, values are treated as uniformly distributed.
+        """
+        if self._n_trials == 0:
+            raise ValueError('No values have been accumulated.')
+
+        rank = q * self._n_trials
+        cumulative = np.cumsum(self._counts)
+
+        if rank > cumulative[-1] and len(self.tail) > 0:
+            idx = int(np.ceil(rank - cumulative[-1])) - 1
+            return self.tail[min(max(idx, 0), len(self.tail) - 1)]
+
+        idx = min(
+            np.searchsorted(cumulative, rank, side='left'),
+            self.n_bins - 1,
+        )
+        below = cumulative[idx - 1] if idx > 0 else 0
+        frac = (rank - below) / self._counts[idx] if self._counts[idx] else 0
+        return self.lower + (idx + frac) * self._width
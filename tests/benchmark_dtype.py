@@ -0,0 +1,163 @@
+"""Benchmarks LLHTestStatistic in float64 and float32 on the mock datasets.
+
+Reports the time per test-statistic evaluation for each dtype, and how much
+the fitted test-statistics of the same trials differ between them.
+"""
+
+from typing import Dict
+
+import argparse
+import copy
+import time
+import numpy as np
+
+from context import mla
+import mock_datasets
+
+
+def main() -> None:
+    """Docstring"""
+    args = parse_args()
+    analysis = build_analysis(args)
+
+    test_params = mla.generate_params(gamma=-2)
+    bounds = [(-4, -1)]
+    trials = [
+        mla.produce_trial(analysis, n_signal_observed=args.n_signal, rng=rng)
+        for rng in map(np.random.default_rng, range(args.n_trials))
+    ]
+
+    results = {}
+    for dtype in [np.float64, np.float32]:
+        ts = mla.LLHTestStatistic(
+            copy.deepcopy(analysis.test_statistic.sob_terms),
+            dtype=dtype,
+        )
+        results[dtype] = benchmark(args, analysis, ts, trials, test_params,
+                                   bounds)
+
+    ts64 = results[np.float64]['ts']
+    ts32 = results[np.float32]['ts']
+    speedup = (results[np.float64]['seconds']
+               / results[np.float32]['seconds'])
+
+    print(f'events per trial: {np.mean([len(t) for t in trials]):.0f}')
+    for dtype, result in results.items():
+        print(f'{np.dtype(dtype).name}: '
+              f'{1e3 * result["seconds"]:.3f} ms per evaluation')
+    print(f'float32 speedup: {speedup:.2f}x')
+    print(f'max |delta TS|: {np.max(np.abs(ts64 - ts32)):.3g}')
+    print(f'max relative delta TS: '
+          f'{np.max(np.abs(ts64 - ts32) / np.maximum(np.abs(ts64), 1)):.3g}')
+
+
+def parse_args() -> argparse.Namespace:
+    """Docstring"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '-n', '--n-events',
+        type=int,
+        default=200000,
+        help='The number of mock data events.',
+    )
+    parser.add_argument(
+        '-t', '--n-trials',
+        type=int,
+        default=10,
+        help='The number of trials to fit.',
+    )
+    parser.add_argument(
+        '-e', '--n-evaluations',
+        type=int,
+        default=200,
+        help='The number of evaluations to time per trial.',
+    )
+    parser.add_argument(
+        '-s', '--n-signal',
+        type=int,
+        default=20,
+        help='The number of signal events per trial.',
+    )
+
+    return parser.parse_args()
+
+
+def build_analysis(args: argparse.Namespace) -> mla.Analysis:
+    """Builds an analysis on mock data spread over the whole sky."""
+    np.random.seed(0)
+    data = mock_datasets.get_random_data(args.n_events)
+    data['dec'] = np.arcsin(np.random.uniform(-1, 1, args.n_events))
+    data['run'] = np.random.randint(0, 100, args.n_events)
+    sim = mock_datasets.get_random_sim(args.n_events)
+    sim['dec'] = np.arcsin(np.random.uniform(-1, 1, args.n_events))
+    sim['trueDec'] = sim['dec']
+    sim['logE'] = (
+        np.log10(sim['trueE']) + np.random.normal(0, .3, args.n_events))
+    grl = mock_datasets.get_random_grl(data)
+
+    source = mla.Source(name='mock', ra=1., dec=.3)
+    profile = mla.UniformProfile(start=50000, length=10000)
+
+    model = mla.I3EventModel(
+        source=source,
+        data=data,
+        sim=sim,
+        grl=grl,
+        gamma=-2,
+        background_time_profile=copy.deepcopy(profile),
+        signal_time_profile=copy.deepcopy(profile),
+        withinwindow=True,
+        signal_sin_dec_bins=20,
+        log_energy_bins=20,
+        gamma_bins=20,
+    )
+
+    ts = mla.LLHTestStatistic([
+        mla.SpatialTerm(),
+        mla.TimeTerm(
+            background_time_profile=copy.deepcopy(profile),
+            signal_time_profile=copy.deepcopy(profile),
+        ),
+        mla.I3EnergyTerm(gamma=-2),
+    ])
+
+    return mla.Analysis(model=model, test_statistic=ts, source=source)
+
+
+def benchmark(
+    args: argparse.Namespace,
+    analysis: mla.Analysis,
+    ts: mla.LLHTestStatistic,
+    trials: list,
+    test_params: np.ndarray,
+    bounds: list,
+) -> Dict[str, np.ndarray]:
+    """Times evaluations and fits every trial with one test-statistic."""
+    gammas = np.linspace(-4, -1, args.n_evaluations)
+    params = test_params.copy()
+    seconds = 0
+
+    for trial in trials:
+        ts.preprocess(params[0], trial, analysis.model, analysis.source,
+                      bounds=bounds)
+        start = time.perf_counter()
+        for gamma in gammas:
+            params['gamma'] = gamma
+            ts(params[0])
+        seconds += time.perf_counter() - start
+
+    fits = np.array([
+        mla.minimize_ts(analysis, trial, test_params=test_params,
+                        bounds=bounds, ts=ts, as_array=True)['ts'][0]
+        for trial in trials
+    ])
+
+    return {
+        'seconds': seconds / (len(trials) * len(gammas)),
+        'ts': fits,
+    }
+
+
+if __name__ == '__main__':
+    main()
@@ -13,10 +13,11 @@ from typing import List
 
 import argparse
 import glob
-import pickle
 import numpy as np
 import matplotlib as mpl
 
+from context import mla
+
 
 def numpy_multifile(glob_strs: List[str]) -> np.ndarray:
     """Docstring"""
@@ -79,8 +80,7 @@ def parse(argv: List[str]) -> dict:
         if args.verbose:
             print('Loading model...', end='', flush=True)
 
-        with open(args.model[0], 'rb') as f:
-            output['model'] = pickle.load(f)
+        output['model'] = mla.I3EventModel.load(args.model[0])
 
         if args.verbose:
             print('done.')
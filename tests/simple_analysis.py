@@ -2,7 +2,6 @@
 
 import sys
 import copy
-import pickle
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -100,7 +99,7 @@ if __name__ == '__main__':
             sampling_width=np.radians(3),
             withinwindow=True,
         )
-        model_file_loc = ''.join([args['outdir'], 'example_model.pkl'])
+        model_file_loc = ''.join([args['outdir'], 'example_model'])
 
         if args['verbose']:
             print(
@@ -109,8 +108,7 @@ if __name__ == '__main__':
                 flush=True,
             )
 
-        with open(model_file_loc, 'wb') as f:
-            pickle.dump(model, f)
+        model.save(model_file_loc)
 
         if args['verbose']:
             print('done.')
@@ -9,15 +9,60 @@ __maintainer__ = 'John Evans'
 __email__ = 'john.evans@icecube.wisc.edu'
 __status__ = 'Development'
 
+import copy
+import json
+import os
+import tempfile
 import unittest
+import numpy as np
 
 from context import mla
 from mla import models
+import mock_datasets
+
+
+def build_model(n_events: int = 2000) -> models.I3EventModel:
+    """Builds a small model on mock data."""
+    np.random.seed(0)
+    data = mock_datasets.get_random_data(n_events)
+    sim = mock_datasets.get_random_sim(n_events)
+    grl = mock_datasets.get_random_grl(data)
+    profile = mla.UniformProfile(start=50000, length=10000)
+
+    return models.I3EventModel(
+        source=mla.Source(name='mock', ra=1., dec=.3),
+        data=data,
+        sim=sim,
+        grl=grl,
+        gamma=-2,
+        background_time_profile=copy.deepcopy(profile),
+        signal_time_profile=copy.deepcopy(profile),
+        withinwindow=True,
+        signal_sin_dec_bins=10,
+        log_energy_bins=10,
+        gamma_bins=10,
+    )
 
 
 class TestEventModel(unittest.TestCase):
     """Docstring"""
 
+    def test_save_loaded_model(self):
+        """A loaded model saves its memory-mapped arrays as .npy files."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first_dir = os.path.join(tmp_dir, 'first')
+            second_dir = os.path.join(tmp_dir, 'second')
+            build_model().save(first_dir)
+            models.I3EventModel.load(first_dir).save(second_dir)
+
+            manifests = []
+            for path in (first_dir, second_dir):
+                with open(os.path.join(path, 'manifest.json')) as manifest:
+                    manifests.append(json.load(manifest))
+
+            self.assertIn('_data', manifests[0]['arrays'])
+            self.assertEqual(manifests[0], manifests[1])
+
 
 class TestThreeMLEventModel(unittest.TestCase):
     """Docstring"""
@@ -0,0 +1,87 @@
+"""Docstring"""
+
+__author__ = 'John Evans'
+__copyright__ = 'Copyright 2020 John Evans'
+__credits__ = ['John Evans', 'Jason Fan', 'Michael Larson']
+__license__ = 'Apache License 2.0'
+__version__ = '0.0.1'
+__maintainer__ = 'John Evans'
+__email__ = 'john.evans@icecube.wisc.edu'
+__status__ = 'Development'
+
+import copy
+import unittest
+import numpy as np
+
+from context import mla
+import mock_datasets
+
+
+def build_analysis(n_events: int = 5000) -> mla.Analysis:
+    """Builds a small analysis on mock data spread over the whole sky."""
+    np.random.seed(0)
+    data = mock_datasets.get_random_data(n_events)
+    data['dec'] = np.arcsin(np.random.uniform(-1, 1, n_events))
+    data['run'] = np.random.randint(0, 50, n_events)
+    sim = mock_datasets.get_random_sim(n_events)
+    sim['dec'] = np.arcsin(np.random.uniform(-1, 1, n_events))
+    sim['trueDec'] = sim['dec']
+    sim['logE'] = np.log10(sim['trueE']) + np.random.normal(0, .3, n_events)
+    grl = mock_datasets.get_random_grl(data)
+
+    source = mla.Source(name='mock', ra=1., dec=.3)
+    profile = mla.UniformProfile(start=50000, length=10000)
+
+    model = mla.I3EventModel(
+        source=source,
+        data=data,
+        sim=sim,
+        grl=grl,
+        gamma=-2,
+        background_time_profile=copy.deepcopy(profile),
+        signal_time_profile=copy.deepcopy(profile),
+        withinwindow=True,
+        signal_sin_dec_bins=10,
+        log_energy_bins=10,
+        gamma_bins=10,
+    )
+
+    ts = mla.LLHTestStatistic([
+        mla.SpatialTerm(),
+        mla.TimeTerm(
+            background_time_profile=copy.deepcopy(profile),
+            signal_time_profile=copy.deepcopy(profile),
+        ),
+        mla.I3EnergyTerm(gamma=-2),
+    ])
+
+    return mla.Analysis(model=model, test_statistic=ts, source=source)
+
+
+class TestScanSky(unittest.TestCase):
+    """Docstring"""
+
+    def test_default_args_report_ns(self):
+        """Pixels with a positive ts have a positive best-fit ns."""
+        analysis = build_analysis()
+        trial = mla.produce_trial(
+            analysis,
+            n_signal_observed=50,
+            rng=np.random.default_rng(0),
+        )
+
+        result = mla.scan_sky(
+            analysis,
+            trial,
+            ras=np.array([1., 1.05, 4.]),
+            decs=np.array([.3, .3, -.5]),
+        )
+
+        hot = result.skymap['ts'] > 0
+        self.assertTrue(hot.any())
+        self.assertTrue(np.all(result.skymap['ns'][hot] > 0))
+        self.assertTrue(np.all(result.skymap['ns'][~hot] == 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+"""Docstring"""
+
+__author__ = 'John Evans'
+__copyright__ = 'Copyright 2020 John Evans'
+__credits__ = ['John Evans', 'Jason Fan', 'Michael Larson']
+__license__ = 'Apache License 2.0'
+__version__ = '0.0.1'
+__maintainer__ = 'John Evans'
+__email__ = 'john.evans@icecube.wisc.edu'
+__status__ = 'Development'
+
+import unittest
+import numpy as np
+
+from context import mla
+from mla import ts_distribution
+
+
+class TestTSAccumulator(unittest.TestCase):
+    """Docstring"""
+
+    def test_single_unsorted_chunk(self):
+        """A tail added in one unsorted chunk is sorted before use."""
+        values = np.array([19.6, 35.3, 8.56, 13.07, 9.14, 28.68, 23.35, 3.97])
+        accumulator = ts_distribution.TSAccumulator(threshold=1, n_bins=10)
+        accumulator.add(values)
+
+        np.testing.assert_array_equal(accumulator.tail, np.sort(values))
+        self.assertAlmostEqual(accumulator.p_value(20), 0.375)
+        self.assertAlmostEqual(accumulator.quantile(0.5), 13.07)
+        self.assertLessEqual(
+            accumulator.quantile(0.6), accumulator.quantile(0.9))
+
+
+if __name__ == '__main__':
+    unittest.main()
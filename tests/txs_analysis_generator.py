@@ -11,7 +11,6 @@ __status__ = 'Development'
 
 import sys
 import copy
-import pickle
 import numpy as np
 
 from context import mla
@@ -57,7 +56,7 @@ if __name__ == '__main__':
             sampling_width=np.radians(3),
             withinwindow=True,
         )
-        model_file_loc = ''.join([args['outdir'], 'txs_model.pkl'])
+        model_file_loc = ''.join([args['outdir'], 'txs_model'])
 
         if args['verbose']:
             print(
@@ -66,8 +65,7 @@ if __name__ == '__main__':
                 flush=True,
             )
 
-        with open(model_file_loc, 'wb') as f:
-            pickle.dump(model, f)
+        model.save(model_file_loc)
 
         if args['verbose']:
             print('done.')
@@ -89,7 +87,7 @@ if __name__ == '__main__':
         source=source,
     )
 
-    analysis_file_loc = ''.join([args['outdir'], 'txs_analysis.pkl'])
+    analysis_file_loc = ''.join([args['outdir'], 'txs_analysis'])
 
     if args['verbose']:
         print(
@@ -98,8 +96,7 @@ if __name__ == '__main__':
             flush=True,
         )
 
-    with open(analysis_file_loc, 'wb') as f:
-        pickle.dump(analysis, f)
+    analysis.save(analysis_file_loc)
 
     if args['verbose']:
         print('done.')
@@ -2,7 +2,6 @@
 
 import itertools
 import argparse
-import pickle
 import numpy as np
 import numpy.lib.recfunctions as rf
 
@@ -30,9 +29,9 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
-        'analysis_pickle',
+        'analysis_dir',
         metavar='A',
-        help='The pickled TXS analysis object file location',
+        help='The saved TXS analysis directory location',
     )
     parser.add_argument(
         '-n', '--n-signal',
@@ -88,13 +87,12 @@ def load_analysis(args: argparse.Namespace) -> mla.Analysis:
     """Docstring"""
     if args.verbose:
         print(
-            f'Loading analysis file: {args.analysis_pickle}...',
+            f'Loading analysis file: {args.analysis_dir}...',
             end='',
             flush=True,
         )
 
-    with open(args.analysis_pickle, 'rb') as f:
-        analysis = pickle.load(f)
+    analysis = mla.Analysis.load(args.analysis_dir)
 
     if args.verbose:
         print('done.')